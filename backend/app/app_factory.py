@@ -2,9 +2,12 @@ from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
 
 from apps.auth.router import router_auth
+from apps.core.query_counter import query_count_middleware
 from apps.health.router import router_health
 from apps.info.router import info_router
+from apps.payments.events import payment_event_queue
 from apps.payments.router import payment_router
+from apps.products.cart_store import cart_store
 from apps.products.router import router_categories, router_orders, router_products
 from apps.users.router import router_users
 from fastapi import FastAPI, requests
@@ -13,6 +16,7 @@ from fastapi.responses import ORJSONResponse
 from fastapi_cache import FastAPICache
 from fastapi_cache.backends.redis import RedisBackend
 from scalar_fastapi import get_scalar_api_reference
+from services.payment_service import payment_provider
 from services.redis_service import redis_service
 from services.sentry_service import init_sentry
 from settings import settings
@@ -24,7 +28,18 @@ init_sentry()
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     redis = redis_service.redis
     FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
+    if settings.REDIS_NEAR_CACHE_ENABLED:
+        await redis_service.near_cache.start()
+    if settings.CART_REDIS_ENABLED:
+        await cart_store.start()
+    if settings.PAYMENT_EVENT_WORKER_ENABLED:
+        await payment_event_queue.start()
     yield
+    await payment_event_queue.stop()
+    if settings.CART_REDIS_ENABLED:
+        await cart_store.stop()
+    await payment_provider.close()
+    await redis_service.near_cache.stop()
     await redis.close()
     await redis.connection_pool.disconnect()
 
@@ -46,6 +61,9 @@ def get_application() -> FastAPI:
         allow_headers=["*"],
     )
 
+    if settings.DEBUG:
+        app.middleware("http")(query_count_middleware)
+
     app.include_router(router_auth, prefix="/auth", tags=["auth"])
     app.include_router(router_users, prefix="/users", tags=["Users"])
     app.include_router(router_categories, prefix="/categories", tags=["Categories"])
@@ -1,16 +1,40 @@
 import datetime as dt
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any
 from uuid import uuid4
 
 import jwt
+import orjson
 from apps.auth.password_handler import PasswordEncrypt
-from apps.auth.schemas import LoginResponseSchema
+from apps.auth.schemas import LoginResponseSchema, RefreshTokenRecordSchema
 from apps.users.crud import User, user_manager
 from fastapi import HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from pydantic import ValidationError
 from services.redis_service import redis_service
 from settings import settings
 from sqlalchemy.ext.asyncio import AsyncSession
 
+FORCED_LOGOUT = b"forced-logout"
+
+# KEYS: used refresh key, new refresh key, user force logout key
+# ARGV: used token iat timestamp, new key ttl in seconds
+ROTATE_REFRESH_KEY_SCRIPT = """
+local record = redis.call('GET', KEYS[1])
+if not record then
+    return false
+end
+redis.call('DEL', KEYS[1])
+local logout_since = redis.call('GET', KEYS[3])
+if logout_since and tonumber(logout_since) > tonumber(ARGV[1]) then
+    return 'forced-logout'
+end
+redis.call('SET', KEYS[2], record, 'EX', ARGV[2])
+return record
+"""
+
 
 class AuthHandler:
     def __init__(self):
@@ -18,6 +42,24 @@ class AuthHandler:
         self.refresh_token_expires = settings.REFRESH_TOKEN_TIME_MINUTES
         self.jwt_algorithm = settings.JWT_ALGORITHM
         self.jwt_secret = settings.JWT_SECRET_KEY
+        self.jwks: dict = {"keys": []}
+        self.signing_key, self.verifying_keys = self.load_keys()
+        self.decoded_tokens: OrderedDict[str, dict] = OrderedDict()
+        self.decoded_tokens_size = settings.JWT_DECODED_CACHE_SIZE
+        self.rotate_refresh_key = redis_service.redis.register_script(
+            ROTATE_REFRESH_KEY_SCRIPT
+        )
+
+    def load_keys(self) -> tuple[Any, dict[str | None, Any]]:
+        if self.jwt_algorithm.startswith("HS"):
+            return self.jwt_secret, {None: self.jwt_secret}
+
+        with open(settings.JWT_PRIVATE_KEY_PATH, "rb") as private_key_file:
+            private_key = private_key_file.read()
+        with open(settings.JWT_JWKS_PATH, "rb") as jwks_file:
+            self.jwks = orjson.loads(jwks_file.read())
+        keyset = jwt.PyJWKSet.from_dict(self.jwks)
+        return private_key, {key.key_id: key.key for key in keyset.keys}
 
     async def get_login_token_pairs(
         self, session: AsyncSession, data: OAuth2PasswordRequestForm
@@ -38,34 +80,48 @@ class AuthHandler:
                 status_code=status.HTTP_403_FORBIDDEN, detail="Invalid password"
             )
 
+        if PasswordEncrypt.needs_update(user.hashed_password):
+            user.hashed_password = await PasswordEncrypt.get_password_hash(
+                data.password
+            )
+            await session.commit()
+
         tokens_response = await self.generate_tokens(user=user)
         return tokens_response
 
     async def generate_tokens(self, user: User) -> LoginResponseSchema:
+        token_record = RefreshTokenRecordSchema.model_validate(user)
+        refresh_key = uuid4().hex
+        await redis_service.set_cache(
+            key=refresh_key,
+            value=token_record.model_dump_json(),
+            ttl=self.refresh_token_expires,
+        )
+        return await self.sign_tokens(
+            token_record=token_record, refresh_key=refresh_key
+        )
+
+    async def sign_tokens(
+        self, token_record: RefreshTokenRecordSchema, refresh_key: str
+    ) -> LoginResponseSchema:
         access_token_payload = {
-            "sub": str(user.id),
-            "email": user.email,
+            "sub": str(token_record.id),
+            "email": token_record.email,
         }
         access_token = await self.generate_token(
             payload=access_token_payload, expire_minutes=self.access_token_expires
         )
 
         refresh_token_payload = {
-            "sub": str(user.id),
-            "email": user.email,
-            "key": uuid4().hex,
+            "sub": str(token_record.id),
+            "email": token_record.email,
+            "key": refresh_key,
         }
 
         refresh_token = await self.generate_token(
             payload=refresh_token_payload, expire_minutes=self.refresh_token_expires
         )
 
-        await redis_service.set_cache(
-            key=refresh_token_payload["key"],
-            value=user.id,
-            ttl=self.refresh_token_expires,
-        )
-
         return LoginResponseSchema(
             access_token=access_token,
             refresh_token=refresh_token,
@@ -80,14 +136,26 @@ class AuthHandler:
             "iat": now,
         }
         payload.update(time_payload)
-        token = jwt.encode(payload, self.jwt_secret, algorithm=self.jwt_algorithm)
+        headers = {"kid": settings.JWT_KEY_ID} if settings.JWT_KEY_ID else None
+        token = jwt.encode(
+            payload, self.signing_key, algorithm=self.jwt_algorithm, headers=headers
+        )
         return token
 
     async def decode_token(self, token: str) -> dict:
+        token_hash = hashlib.sha256(token.encode()).hexdigest()
+        cached_payload = self.decoded_tokens.get(token_hash)
+        if cached_payload:
+            if cached_payload["exp"] > time.time():
+                self.decoded_tokens.move_to_end(token_hash)
+                return dict(cached_payload)
+            del self.decoded_tokens[token_hash]
+
         try:
-            payload = jwt.decode(token, self.jwt_secret, [self.jwt_algorithm])
+            payload = jwt.decode(
+                token, self.get_verifying_key(token), [self.jwt_algorithm]
+            )
             payload["iat"] = dt.datetime.fromtimestamp(payload.get("iat") or 0)
-            return payload
         except jwt.ExpiredSignatureError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired"
@@ -97,9 +165,22 @@ class AuthHandler:
                 status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid token"
             )
 
-    async def get_refresh_tokens(
-        self, refresh_token: str, session: AsyncSession
-    ) -> LoginResponseSchema:
+        # refresh tokens are single use, only access tokens are worth keeping
+        if not payload.get("key"):
+            self.decoded_tokens[token_hash] = dict(payload)
+            while len(self.decoded_tokens) > self.decoded_tokens_size:
+                self.decoded_tokens.popitem(last=False)
+        return payload
+
+    def get_verifying_key(self, token: str) -> Any:
+        if len(self.verifying_keys) == 1:
+            return next(iter(self.verifying_keys.values()))
+        key_id = jwt.get_unverified_header(token).get("kid")
+        if key_id not in self.verifying_keys:
+            raise jwt.InvalidTokenError(f"Unknown key id {key_id}")
+        return self.verifying_keys[key_id]
+
+    async def get_refresh_tokens(self, refresh_token: str) -> LoginResponseSchema:
         payload = await self.decode_token(refresh_token)
         token_key = payload.get("key")
         if not token_key:
@@ -108,30 +189,55 @@ class AuthHandler:
                 detail="Access token was provided",
             )
 
-        stored_refresh = await redis_service.get_cache()
+        new_token_key = uuid4().hex
+        stored_refresh = await self.rotate_refresh_key(
+            keys=[token_key, new_token_key, self.get_force_logout_key(payload["sub"])],
+            args=[payload["iat"].timestamp(), self.refresh_token_expires * 60],
+        )
         if not stored_refresh:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Token was used already"
             )
-        await redis_service.delete_cache(payload["key"])
-        user: User | None = await user_manager.get(
-            session=session, field=User.id, field_value=int(payload["sub"])
-        )
-
-        if user.use_token_since and user.use_token_since > payload["iat"]:
+        if stored_refresh == FORCED_LOGOUT:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="User forced logout",
             )
 
-        if not user:
+        try:
+            token_record = RefreshTokenRecordSchema.model_validate_json(stored_refresh)
+        except ValidationError:
+            # records written before they held the user, such as a bare user id
+            await redis_service.delete_cache(new_token_key)
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found",
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Refresh token is outdated, log in again",
+            )
+        if (
+            token_record.use_token_since
+            and token_record.use_token_since > payload["iat"]
+        ):
+            await redis_service.delete_cache(new_token_key)
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User forced logout",
             )
 
-        tokens_response = await self.generate_tokens(user=user)
+        tokens_response = await self.sign_tokens(
+            token_record=token_record, refresh_key=new_token_key
+        )
         return tokens_response
 
+    async def revoke_refresh_tokens(self, user_id: int, since: dt.datetime) -> None:
+        await redis_service.set_cache(
+            key=self.get_force_logout_key(user_id),
+            value=since.timestamp(),
+            ttl=self.refresh_token_expires,
+        )
+
+    @staticmethod
+    def get_force_logout_key(user_id: int | str) -> str:
+        return f"force-logout:{user_id}"
+
 
 auth_handler = AuthHandler()
@@ -1,6 +1,7 @@
 from enum import StrEnum
 from typing import Callable
 
+from apps.auth.user_cache import user_cache
 from apps.core.dependencies import get_async_session
 from apps.users.crud import User, user_manager
 from fastapi import Depends, HTTPException, status
@@ -26,14 +27,21 @@ async def get_current_user(
             detail="Refresh token was given",
         )
 
-    user: User | None = await user_manager.get(
-        session=session, field=User.id, field_value=int(payload["sub"])
-    )
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User with given email not found",
+    user_id = int(payload["sub"])
+    cached_user = await user_cache.get(user_id)
+    if cached_user:
+        user = User(**cached_user.model_dump())
+    else:
+        version = await user_cache.get_version(user_id)
+        user: User | None = await user_manager.get(
+            session=session, field=User.id, field_value=user_id
         )
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User with given email not found",
+            )
+        await user_cache.set(user, version=version)
 
     if user.use_token_since and user.use_token_since > payload["iat"]:
         raise HTTPException(
@@ -1,13 +1,65 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
+from settings import settings
 
-class PasswordEncrypt:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+class PasswordEncrypt:
+    pwd_context = CryptContext(
+        schemes=settings.PASSWORD_HASH_SCHEMES,
+        deprecated="auto",
+        bcrypt__rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+        argon2__type="ID",
+        argon2__time_cost=settings.PASSWORD_ARGON2_TIME_COST,
+        argon2__memory_cost=settings.PASSWORD_ARGON2_MEMORY_COST,
+        argon2__parallelism=settings.PASSWORD_ARGON2_PARALLELISM,
+    )
+    executor = ThreadPoolExecutor(
+        max_workers=settings.PASSWORD_HASH_WORKERS,
+        thread_name_prefix="password-hash",
+    )
+    semaphore = asyncio.Semaphore(settings.PASSWORD_HASH_MAX_CONCURRENCY)
+    in_flight: int = 0
 
     @classmethod
     async def get_password_hash(cls, password: str) -> str:
-        return cls.pwd_context.hash(password)
+        return await cls._run_in_executor(cls.pwd_context.hash, password)
 
     @classmethod
     async def verify_password(cls, plain_password: str, hashed_password: str) -> bool:
-        return cls.pwd_context.verify(plain_password, hashed_password)
\ No newline at end of file
+        return await cls._run_in_executor(
+            cls.pwd_context.verify, plain_password, hashed_password
+        )
+
+    @classmethod
+    def needs_update(cls, hashed_password: str) -> bool:
+        return cls.pwd_context.needs_update(hashed_password)
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        return {
+            "in_flight": cls.in_flight,
+            "queue_depth": max(
+                cls.in_flight - settings.PASSWORD_HASH_MAX_CONCURRENCY, 0
+            ),
+            "max_concurrency": settings.PASSWORD_HASH_MAX_CONCURRENCY,
+            "max_queue": settings.PASSWORD_HASH_MAX_QUEUE,
+        }
+
+    @classmethod
+    async def _run_in_executor(cls, func: Callable, *args: Any) -> Any:
+        if cls.get_stats()["queue_depth"] >= settings.PASSWORD_HASH_MAX_QUEUE:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many authentication requests, try again later",
+            )
+        cls.in_flight += 1
+        try:
+            async with cls.semaphore:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(cls.executor, func, *args)
+        finally:
+            cls.in_flight -= 1
@@ -34,11 +34,8 @@ async def user_loging(
 @router_auth.post("/refresh")
 async def refresh_user_token(
     refresh_token: str = Header(alias="X-Refresh-Token"),
-    session: AsyncSession = Depends(get_async_session),
 ) -> LoginResponseSchema:
-    token_pair = await auth_handler.get_refresh_tokens(
-        refresh_token=refresh_token, session=session
-    )
+    token_pair = await auth_handler.get_refresh_tokens(refresh_token=refresh_token)
     return token_pair
 
 
@@ -47,9 +44,19 @@ async def force_logout(
     user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_async_session),
 ) -> None:
+    force_logout_data = ForceLogoutSchema()
     await user_manager.patch(
         instance_id=user.id,
-        data_to_patch=ForceLogoutSchema(),
+        data_to_patch=force_logout_data,
         session=session,
         exclude_unset=False,
     )
+    await auth_handler.revoke_refresh_tokens(
+        user_id=user.id, since=force_logout_data.use_token_since
+    )
+
+
+@router_auth.get("/jwks")
+async def get_jwks() -> dict:
+    """Public keys for verifying access tokens signed with an asymmetric algorithm"""
+    return auth_handler.jwks
@@ -1,6 +1,6 @@
 import datetime as dt
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class LoginResponseSchema(BaseModel):
@@ -12,3 +12,22 @@ class LoginResponseSchema(BaseModel):
 
 class ForceLogoutSchema(BaseModel):
     use_token_since: dt.datetime = Field(default_factory=dt.datetime.now)
+
+
+class CachedUserSchema(BaseModel):
+    id: int
+    name: str
+    email: str
+    is_admin: bool | None
+    permissions: list[str]
+    use_token_since: dt.datetime | None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class RefreshTokenRecordSchema(BaseModel):
+    id: int
+    email: str
+    use_token_since: dt.datetime | None
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,109 @@
+import time
+from collections import OrderedDict
+
+from apps.auth.schemas import CachedUserSchema
+from apps.users.models import User
+from services.redis_service import redis_service
+from settings import settings
+
+# KEYS: user cache key, user version key
+# ARGV: version read before the user was loaded, user json, ttl in seconds
+# a user loaded before an invalidation is not written back over it
+SET_IF_VERSION_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+# KEYS: user cache key, user version key
+# ARGV: version ttl in seconds
+INVALIDATE_SCRIPT = """
+redis.call('DEL', KEYS[1])
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+return 1
+"""
+
+
+class UserCache:
+    """Two-tier cache of the user fields needed to authorize a request.
+
+    The in-process tier lives only for a few seconds, because invalidation
+    reaches other workers through the Redis tier only. Every invalidation
+    bumps a per user version, and a user is cached only if the version read
+    before loading it from the database is still current.
+    """
+
+    def __init__(self):
+        self.ttl = settings.AUTH_USER_CACHE_TTL_MINUTES
+        self.local_ttl = settings.AUTH_USER_CACHE_LOCAL_TTL_SECONDS
+        self.local_size = settings.AUTH_USER_CACHE_LOCAL_SIZE
+        self._local: OrderedDict[int, tuple[float, CachedUserSchema]] = OrderedDict()
+        self.set_if_version = redis_service.redis.register_script(SET_IF_VERSION_SCRIPT)
+        self.invalidate_user = redis_service.redis.register_script(INVALIDATE_SCRIPT)
+
+    @staticmethod
+    def get_key(user_id: int) -> str:
+        return f"auth-user:{user_id}"
+
+    @staticmethod
+    def get_version_key(user_id: int) -> str:
+        return f"auth-user-version:{user_id}"
+
+    async def get(self, user_id: int) -> CachedUserSchema | None:
+        local_entry = self._local.get(user_id)
+        if local_entry:
+            expires_at, cached_user = local_entry
+            if expires_at > time.monotonic():
+                self._local.move_to_end(user_id)
+                return cached_user
+            del self._local[user_id]
+
+        raw_user = await redis_service.get_cache(self.get_key(user_id))
+        if raw_user is None:
+            return None
+        cached_user = CachedUserSchema.model_validate_json(raw_user)
+        self._remember(cached_user)
+        return cached_user
+
+    async def get_version(self, user_id: int) -> str:
+        """Read before loading the user, then passed to ``set``"""
+        async with redis_service.get_redis() as _redis:
+            version = await _redis.get(self.get_version_key(user_id))
+        return version.decode() if version else "0"
+
+    async def set(self, user: User, version: str) -> CachedUserSchema:
+        cached_user = CachedUserSchema.model_validate(user)
+        key = self.get_key(user.id)
+        redis_service.near_cache.invalidate(key)
+        is_set = await self.set_if_version(
+            keys=[key, self.get_version_key(user.id)],
+            args=[version, cached_user.model_dump_json(), self.ttl * 60],
+        )
+        if is_set:
+            self._remember(cached_user)
+        return cached_user
+
+    async def invalidate(self, user_id: int) -> None:
+        """Call after the change is committed"""
+        self._local.pop(user_id, None)
+        key = self.get_key(user_id)
+        redis_service.near_cache.invalidate(key)
+        # outlives any entry cached with the previous version
+        await self.invalidate_user(
+            keys=[key, self.get_version_key(user_id)], args=[self.ttl * 60 * 2]
+        )
+
+    def _remember(self, cached_user: CachedUserSchema) -> None:
+        self._local[cached_user.id] = (
+            time.monotonic() + self.local_ttl,
+            cached_user,
+        )
+        self._local.move_to_end(cached_user.id)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+
+user_cache = UserCache()
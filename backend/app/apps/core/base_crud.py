@@ -1,19 +1,63 @@
+import hashlib
 import math
 from abc import ABC, abstractmethod
-from typing import Any, Optional
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, AsyncIterator, Optional, Sequence
 
+import orjson
 from apps.core.base_models import Base
-from apps.core.schemas import PaginationResponseSchema, SearchParamsSchema, SortEnum
+from apps.core.pagination import decode_cursor, encode_cursor
+from apps.core.schemas import (
+    BatchPatchResultSchema,
+    BatchPatchStatusEnum,
+    CountStrategyEnum,
+    PaginationModeEnum,
+    PaginationResponseSchema,
+    SearchModeEnum,
+    SearchParamsSchema,
+    SortEnum,
+)
 from fastapi import HTTPException, status
-from pydantic import BaseModel
-from sqlalchemy import and_, asc, delete, desc, exists, func, or_, select, update
+from pydantic import BaseModel, TypeAdapter
+from services.redis_service import redis_service
+from sqlalchemy import (
+    Boolean,
+    ColumnElement,
+    Integer,
+    Select,
+    and_,
+    asc,
+    case,
+    cast,
+    column,
+    delete,
+    desc,
+    exists,
+    func,
+    literal_column,
+    or_,
+    select,
+    text,
+    tuple_,
+    update,
+    values,
+)
 from sqlalchemy.exc import DBAPIError, IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import InstrumentedAttribute
+from sqlalchemy.sql.base import ExecutableOption
+
+
+@lru_cache
+def _get_list_adapter(schema: type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(list[schema])
 
 
 class BaseCRUDManager(ABC):
     model: type[Base] = None
+    count_cache_ttl: int = 1
+    search_config: str = "simple"
 
     @abstractmethod
     def __init__(self):
@@ -33,9 +77,14 @@ class BaseCRUDManager(ABC):
             )
 
     async def get(
-        self, *, session: AsyncSession, field_value: Any, field: InstrumentedAttribute
+        self,
+        *,
+        session: AsyncSession,
+        field_value: Any,
+        field: InstrumentedAttribute,
+        options: Sequence[ExecutableOption] = (),
     ) -> Optional[Base]:
-        query = select(self.model).filter(field == field_value)
+        query = select(self.model).filter(field == field_value).options(*options)
         result = await session.execute(query)
         return result.scalar_one_or_none()
 
@@ -46,6 +95,14 @@ class BaseCRUDManager(ABC):
         data_to_patch: BaseModel,
         exclude_unset: bool = True,
     ) -> Base:
+        if "version" in self.model.__table__.c:
+            return await self._patch_versioned(
+                instance_id=instance_id,
+                session=session,
+                data_to_patch=data_to_patch,
+                exclude_unset=exclude_unset,
+            )
+
         query = (
             select(self.model)
             .filter(self.model.id == instance_id)
@@ -71,25 +128,171 @@ class BaseCRUDManager(ABC):
         if not data_for_updating:
             return item
 
-        optimistic_offline_lock_version = getattr(item, "version", None)
-        if optimistic_offline_lock_version is not None:
-            if optimistic_offline_lock_version != getattr(
-                data_to_patch, "version", None
+        query = (
+            update(self.model)
+            .where(self.model.id == instance_id)
+            .values(**data_for_updating)
+        )
+        await session.execute(query)
+        await session.commit()
+        return item
+
+    async def _patch_versioned(
+        self,
+        instance_id: int,
+        session: AsyncSession,
+        data_to_patch: BaseModel,
+        exclude_unset: bool = True,
+    ) -> Base:
+        """Optimistic lock in one statement, the version check is in the WHERE"""
+        data_for_updating: dict = data_to_patch.model_dump(
+            exclude={"id", "version"}, exclude_unset=exclude_unset
+        )
+        if not data_for_updating:
+            item = await self.get(
+                session=session, field=self.model.id, field_value=instance_id
+            )
+        else:
+            query = (
+                update(self.model)
+                .where(
+                    self.model.id == instance_id,
+                    self.model.version == getattr(data_to_patch, "version", None),
+                )
+                .values(**data_for_updating, version=self.model.version + 1)
+                .returning(self.model)
+                .execution_options(populate_existing=True)
+            )
+            result = await session.execute(query)
+            item = result.scalar_one_or_none()
+            if item:
+                await session.commit()
+                return item
+
+            await session.rollback()
+            if await self.item_exists(
+                session=session, field=self.model.id, field_value=instance_id
             ):
                 raise HTTPException(
                     detail="Item has been modified by another user",
                     status_code=status.HTTP_409_CONFLICT,
                 )
-            data_for_updating |= {"version": data_to_patch.version + 1}
+
+        if not item:
+            raise HTTPException(
+                detail=f"Item with id {instance_id} not found",
+                status_code=status.HTTP_404_NOT_FOUND,
+            )
+        return item
+
+    async def patch_many(
+        self, session: AsyncSession, items: Sequence[BaseModel]
+    ) -> list[BatchPatchResultSchema]:
+        """Apply ``{id, version, changes}`` items with a single UPDATE.
+
+        Items of a versioned model are only updated when their version
+        matches, the others are reported as conflicts or not found.
+        """
+        changes_by_id: dict[int, dict] = {}
+        for item in items:
+            if item.id in changes_by_id:
+                raise HTTPException(
+                    detail=f"Item with id {item.id} is repeated",
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                )
+            changes_by_id[item.id] = item.changes.model_dump(exclude_unset=True)
+            if not changes_by_id[item.id]:
+                raise HTTPException(
+                    detail=f"Item with id {item.id} has no changes",
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                )
+
+        is_versioned = "version" in self.model.__table__.c
+        fields = sorted({key for changes in changes_by_id.values() for key in changes})
+        # every field comes with a flag, so items may change different fields
+        value_columns = [column("id", Integer)]
+        if is_versioned:
+            value_columns.append(column("version", Integer))
+        for field in fields:
+            value_columns.append(column(field, self.model.__table__.c[field].type))
+            value_columns.append(column(f"{field}_is_set", Boolean))
+
+        rows = []
+        for item in items:
+            changes = changes_by_id[item.id]
+            row = [item.id]
+            if is_versioned:
+                row.append(getattr(item, "version", None))
+            for field in fields:
+                row.extend((changes.get(field), field in changes))
+            rows.append(tuple(row))
+        patch_values = values(*value_columns, name="patch_values").data(rows)
 
         query = (
             update(self.model)
-            .where(self.model.id == instance_id)
-            .values(**data_for_updating)
+            .where(self.model.id == patch_values.c.id)
+            .values(
+                {
+                    field: case(
+                        (
+                            patch_values.c[f"{field}_is_set"],
+                            # a column of nulls only would be typed as text
+                            cast(
+                                patch_values.c[field],
+                                self.model.__table__.c[field].type,
+                            ),
+                        ),
+                        else_=getattr(self.model, field),
+                    )
+                    for field in fields
+                }
+            )
+            .execution_options(synchronize_session=False)
         )
-        await session.execute(query)
-        await session.commit()
-        return item
+        returning = [self.model.id]
+        if is_versioned:
+            query = query.where(self.model.version == patch_values.c.version).values(
+                version=self.model.version + 1
+            )
+            returning.append(self.model.version)
+
+        try:
+            result = await session.execute(query.returning(*returning))
+            updated_versions = {
+                row.id: row._mapping.get("version") for row in result.all()
+            }
+            # tell conflicts from missing items for the rest
+            current_versions = {}
+            not_updated_ids = changes_by_id.keys() - updated_versions.keys()
+            if not_updated_ids:
+                result = await session.execute(
+                    select(*returning).filter(self.model.id.in_(not_updated_ids))
+                )
+                current_versions = {
+                    row.id: row._mapping.get("version") for row in result.all()
+                }
+            await session.commit()
+        except IntegrityError as e:
+            await session.rollback()
+            raise HTTPException(
+                detail=f"Error has occurred while updating {self.model.__tablename__}, {e.orig}",
+                status_code=status.HTTP_409_CONFLICT,
+            )
+
+        results = []
+        for item_id in changes_by_id:
+            if item_id in updated_versions:
+                item_status = BatchPatchStatusEnum.UPDATED
+                version = updated_versions[item_id]
+            elif item_id in current_versions:
+                item_status = BatchPatchStatusEnum.CONFLICT
+                version = current_versions[item_id]
+            else:
+                item_status, version = BatchPatchStatusEnum.NOT_FOUND, None
+            results.append(
+                BatchPatchResultSchema(id=item_id, status=item_status, version=version)
+            )
+        return results
 
     async def get_items_paginated(
         self,
@@ -98,41 +301,290 @@ class BaseCRUDManager(ABC):
         params: SearchParamsSchema,
         targeted_schema: type[BaseModel],
         search_fields: list[InstrumentedAttribute] = None,
+        projection: bool = False,
     ) -> PaginationResponseSchema:
+        """Get a page of items serialized with ``targeted_schema``.
+
+        With ``projection`` only the columns declared by the schema are
+        selected and rows are validated in bulk, without building ORM
+        instances.
+        """
         sort_direction = asc if params.sort_direction == SortEnum.ASC else desc
-        query = select(self.model)
+        sort_field = getattr(self.model, params.sort_by, self.model.id)
+        if projection:
+            query = select(*self._get_projection_columns(targeted_schema, sort_field))
+        else:
+            query = select(self.model)
         count_query = select(func.count()).select_from(self.model)
+        search_field_condition = None
+        search_rank = None
 
         if params.q and search_fields:
-            if params.use_sharp_filter:
-                search_field_condition = or_(
-                    func.lower(search_fields) == params.q
-                    for search_fields in search_fields
-                )
-            else:
-                words = [word for word in params.q.split() if len(word) > 1]
-                search_field_condition = or_(
-                    and_(*(search_fields.icontains(word) for word in words))
-                    for search_fields in search_fields
-                )
+            search_field_condition, search_rank = self._build_search_condition(
+                params=params, search_fields=search_fields
+            )
             query = query.filter(search_field_condition)
             count_query = count_query.filter(search_field_condition)
 
-        sort_field = getattr(self.model, params.sort_by, self.model.id)
-        query = query.order_by(sort_direction(sort_field))
-        offset = (params.page - 1) * params.limit
-        query = query.offset(offset).limit(params.limit)
+        if params.pagination_mode == PaginationModeEnum.CURSOR:
+            query = self._apply_cursor(
+                query=query, params=params, sort_field=sort_field
+            )
+        else:
+            if search_rank is not None:
+                query = query.order_by(desc(search_rank))
+            query = query.order_by(sort_direction(sort_field))
+            query = query.offset((params.page - 1) * params.limit)
+        # one extra row tells whether there is a next page without counting
+        query = query.limit(params.limit + 1)
 
-        result = await session.execute(query)
-        result_count = await session.execute(count_query)
-        total_count: int = result_count.scalar()
+        total_count: Optional[int] = None
+        if params.count_strategy == CountStrategyEnum.EXACT:
+            query = query.add_columns(
+                count_query.scalar_subquery().label("total_count")
+            )
+            result = await session.execute(query)
+            rows = result.all()
+            if projection:
+                items = [row._mapping for row in rows]
+            else:
+                items = [row[0] for row in rows]
+            if rows:
+                total_count = rows[0].total_count
+        else:
+            result = await session.execute(query)
+            items = result.mappings().all() if projection else result.scalars().all()
+
+        if total_count is None:
+            total_count = await self._count_items(
+                session=session,
+                count_query=count_query,
+                count_strategy=params.count_strategy,
+                search_condition=search_field_condition,
+            )
+
+        has_more = len(items) > params.limit
+        items = items[: params.limit]
+        next_cursor = None
+        if has_more and params.pagination_mode == PaginationModeEnum.CURSOR:
+            last_item = items[-1]
+            if projection:
+                sort_value, item_id = last_item[sort_field.key], last_item["id"]
+            else:
+                sort_value, item_id = getattr(last_item, sort_field.key), last_item.id
+            next_cursor = encode_cursor(
+                sort_by=sort_field.key, sort_value=sort_value, item_id=item_id
+            )
+
+        if projection:
+            # rows also hold the total count and the cursor columns
+            schema_keys = self._get_projection_keys(targeted_schema)
+            items = _get_list_adapter(targeted_schema).validate_python(
+                [{key: item[key] for key in schema_keys} for item in items]
+            )
+        else:
+            items = [targeted_schema.from_orm(item) for item in items]
 
         return PaginationResponseSchema(
-            items=[targeted_schema.from_orm(item) for item in result.scalars().all()],
+            items=items,
             total=total_count,
             page=params.page,
             limit=params.limit,
-            pages=math.ceil(total_count / params.limit),
+            pages=(
+                math.ceil(total_count / params.limit)
+                if total_count is not None
+                else None
+            ),
+            has_more=has_more,
+            next_cursor=next_cursor,
+        )
+
+    async def stream_items(
+        self,
+        *,
+        session: AsyncSession,
+        targeted_schema: type[BaseModel],
+        updated_since: Optional[datetime] = None,
+        chunk_size: int = 1000,
+    ) -> AsyncIterator[list[dict]]:
+        """Stream all items as JSON-ready dicts, ``chunk_size`` rows at a time.
+
+        Rows are read through a server side cursor, so memory does not grow
+        with the table size.
+        """
+        query = select(
+            *self._get_projection_columns(targeted_schema, self.model.id)
+        ).order_by(self.model.id)
+        if updated_since is not None:
+            query = query.filter(self.model.updated_at > updated_since)
+
+        adapter = _get_list_adapter(targeted_schema)
+        schema_keys = self._get_projection_keys(targeted_schema)
+        result = await session.stream(query.execution_options(yield_per=chunk_size))
+        async for rows in result.mappings().partitions():
+            items = adapter.validate_python(
+                [{key: row[key] for key in schema_keys} for row in rows]
+            )
+            yield adapter.dump_python(items, mode="json")
+
+    def _get_projection_keys(self, schema: type[BaseModel]) -> list[str]:
+        column_keys = self.model.__mapper__.column_attrs.keys()
+        return [key for key in schema.model_fields if key in column_keys]
+
+    def _get_projection_columns(
+        self, schema: type[BaseModel], sort_field: InstrumentedAttribute
+    ) -> list[InstrumentedAttribute]:
+        keys = self._get_projection_keys(schema)
+        # the cursor of the next page is built from the sort field and id
+        for key in (sort_field.key, self.model.id.key):
+            if key not in keys:
+                keys.append(key)
+        return [getattr(self.model, key) for key in keys]
+
+    async def _count_items(
+        self,
+        session: AsyncSession,
+        count_query: Select,
+        count_strategy: CountStrategyEnum,
+        search_condition: Optional[ColumnElement] = None,
+    ) -> Optional[int]:
+        if count_strategy == CountStrategyEnum.NONE:
+            return None
+
+        if count_strategy == CountStrategyEnum.ESTIMATED:
+            return await self._estimate_count(
+                session=session, search_condition=search_condition
+            )
+
+        cache_key = None
+        if count_strategy == CountStrategyEnum.CACHED:
+            compiled_query = self._compile_with_literals(session, count_query)
+            query_hash = hashlib.sha1(compiled_query.encode()).hexdigest()
+            cache_key = f"count:{self.model.__tablename__}:{query_hash}"
+            cached_count = await redis_service.get_cache(cache_key)
+            if cached_count is not None:
+                return int(cached_count)
+
+        result = await session.execute(count_query)
+        total_count: int = result.scalar()
+        if cache_key:
+            await redis_service.set_cache(
+                key=cache_key, value=total_count, ttl=self.count_cache_ttl
+            )
+        return total_count
+
+    async def _estimate_count(
+        self, session: AsyncSession, search_condition: Optional[ColumnElement]
+    ) -> int:
+        if search_condition is None:
+            result = await session.execute(
+                text(
+                    "SELECT reltuples::bigint FROM pg_class "
+                    "WHERE oid = CAST(:table_name AS regclass)"
+                ),
+                {"table_name": self.model.__tablename__},
+            )
+            return max(result.scalar() or 0, 0)
+
+        compiled_query = self._compile_with_literals(
+            session, select(self.model.id).filter(search_condition)
+        )
+        connection = await session.connection()
+        result = await connection.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {compiled_query}"
+        )
+        plan = result.scalar()
+        if isinstance(plan, (str, bytes)):
+            plan = orjson.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    @staticmethod
+    def _compile_with_literals(session: AsyncSession, query: Select) -> str:
+        return str(
+            query.compile(
+                dialect=session.bind.dialect,
+                compile_kwargs={"literal_binds": True},
+            )
+        )
+
+    def _build_search_condition(
+        self, params: SearchParamsSchema, search_fields: list[InstrumentedAttribute]
+    ) -> tuple[ColumnElement, Optional[ColumnElement]]:
+        if params.use_sharp_filter:
+            search_field_condition = or_(
+                func.lower(search_fields) == params.q for search_fields in search_fields
+            )
+            return search_field_condition, None
+
+        if params.search_mode == SearchModeEnum.FULL_TEXT:
+            search_vector = getattr(self.model, "search_vector", None)
+            if search_vector is None:
+                raise HTTPException(
+                    detail=f"Full text search is not supported for {self.model.__tablename__}",
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                )
+            # the config is a trusted class attribute, rendered inline since
+            # there is no literal renderer for a bound regconfig parameter
+            search_config = literal_column(f"'{self.search_config}'::regconfig")
+            ts_query = func.websearch_to_tsquery(search_config, params.q)
+            search_field_condition = search_vector.bool_op("@@")(ts_query)
+            return search_field_condition, func.ts_rank(search_vector, ts_query)
+
+        if params.search_mode == SearchModeEnum.FUZZY:
+            trigram_fields = [
+                field for field in search_fields if self._has_trigram_index(field)
+            ]
+            if not trigram_fields:
+                raise HTTPException(
+                    detail=f"Fuzzy search is not supported for {self.model.__tablename__}",
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                )
+            search_field_condition = or_(
+                field.bool_op("%")(params.q) for field in trigram_fields
+            )
+            search_rank = func.greatest(
+                *(func.similarity(field, params.q) for field in trigram_fields)
+            )
+            return search_field_condition, search_rank
+
+        words = [word for word in params.q.split() if len(word) > 1]
+        search_field_condition = or_(
+            and_(*(search_fields.icontains(word) for word in words))
+            for search_fields in search_fields
+        )
+        return search_field_condition, None
+
+    def _has_trigram_index(self, field: InstrumentedAttribute) -> bool:
+        for index in self.model.__table__.indexes:
+            index_ops: dict = index.dialect_options["postgresql"]["ops"] or {}
+            if index_ops.get(field.key) == "gin_trgm_ops":
+                return True
+        return False
+
+    def _apply_cursor(
+        self,
+        query: Select,
+        params: SearchParamsSchema,
+        sort_field: InstrumentedAttribute,
+    ) -> Select:
+        is_asc = params.sort_direction == SortEnum.ASC
+        sort_direction = asc if is_asc else desc
+        seek_columns = [sort_field]
+        if sort_field.key != self.model.id.key:
+            seek_columns.append(self.model.id)
+        query = query.order_by(*(sort_direction(column) for column in seek_columns))
+
+        if not params.cursor:
+            return query
+
+        sort_value, item_id = decode_cursor(params.cursor, sort_by=sort_field.key)
+        if len(seek_columns) > 1:
+            seek_key = tuple_(*seek_columns)
+            seek_position = tuple_(sort_value, item_id)
+        else:
+            seek_key, seek_position = self.model.id, item_id
+        return query.filter(
+            seek_key > seek_position if is_asc else seek_key < seek_position
         )
 
     async def item_exists(
@@ -156,9 +608,13 @@ class BaseCRUDManager(ABC):
         await session.commit()
 
     async def get_or_create(
-        self, session: AsyncSession, defaults: dict = None, **kwargs
+        self,
+        session: AsyncSession,
+        defaults: dict = None,
+        options: Sequence[ExecutableOption] = (),
+        **kwargs,
     ) -> Optional[Base]:
-        query = select(self.model).filter_by(**kwargs)
+        query = select(self.model).filter_by(**kwargs).options(*options)
         result = await session.execute(query)
         instance = result.scalar_one_or_none()
         if instance:
@@ -168,8 +624,18 @@ class BaseCRUDManager(ABC):
         session.add(instance)
         try:
             await session.commit()
-            await session.refresh(instance)
-            return instance
+            if not options:
+                await session.refresh(instance)
+                return instance
+            # relationships of a new instance are not loaded, fetch them explicitly
+            query = (
+                select(self.model)
+                .filter(self.model.id == instance.id)
+                .options(*options)
+                .execution_options(populate_existing=True)
+            )
+            result = await session.execute(query)
+            return result.scalar_one()
         except IntegrityError:
             await session.rollback()
             raise HTTPException(
@@ -0,0 +1,59 @@
+from typing import AsyncIterator
+
+import orjson
+from apps.core.schemas import ExportFormatEnum
+from fastapi.responses import StreamingResponse
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormatEnum.NDJSON: "application/x-ndjson",
+    ExportFormatEnum.JSON: "application/json",
+}
+
+
+async def _encode_ndjson(chunks: AsyncIterator[list[dict]]) -> AsyncIterator[bytes]:
+    async for items in chunks:
+        yield b"".join(orjson.dumps(item) + b"\n" for item in items)
+
+
+async def _encode_json_array(
+    chunks: AsyncIterator[list[dict]],
+) -> AsyncIterator[bytes]:
+    yield b"["
+    separator = b""
+    async for items in chunks:
+        if not items:
+            continue
+        yield separator + b",".join(orjson.dumps(item) for item in items)
+        separator = b","
+    yield b"]"
+
+
+async def _prepend(
+    items: list[dict] | None, chunks: AsyncIterator[list[dict]]
+) -> AsyncIterator[list[dict]]:
+    if items is not None:
+        yield items
+    async for items in chunks:
+        yield items
+
+
+async def export_response(
+    chunks: AsyncIterator[list[dict]],
+    export_format: ExportFormatEnum,
+    filename: str,
+) -> StreamingResponse:
+    # the first fetch runs before the status is sent, so a failing query
+    # becomes an error response instead of a truncated export
+    first_items = await anext(chunks, None)
+    encoder = (
+        _encode_ndjson
+        if export_format == ExportFormatEnum.NDJSON
+        else _encode_json_array
+    )
+    return StreamingResponse(
+        encoder(_prepend(first_items, chunks)),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{export_format}"'
+        },
+    )
@@ -0,0 +1,48 @@
+import base64
+import datetime as dt
+from typing import Any
+
+import orjson
+from apps.core.schemas import SortFieldEnum
+from fastapi import HTTPException, status
+
+
+def encode_cursor(sort_by: str, sort_value: Any, item_id: int) -> str:
+    is_datetime = isinstance(sort_value, dt.datetime)
+    payload = {
+        "sort_by": sort_by,
+        "value": sort_value.isoformat() if is_datetime else sort_value,
+        "is_datetime": is_datetime,
+        "id": item_id,
+    }
+    return base64.urlsafe_b64encode(orjson.dumps(payload)).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str) -> tuple[Any, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload: dict = orjson.loads(raw)
+        value = payload["value"]
+        if payload["is_datetime"]:
+            value = dt.datetime.fromisoformat(value)
+        item_id = int(payload["id"])
+        cursor_sort_by = payload["sort_by"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            detail="Invalid cursor", status_code=status.HTTP_400_BAD_REQUEST
+        )
+
+    if cursor_sort_by != sort_by:
+        raise HTTPException(
+            detail="Cursor was issued for another sort field",
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+    # sorted by id the item id is the whole position, other sort fields are
+    # naive datetimes, compared with timestamp columns
+    if sort_by != SortFieldEnum.ID and (
+        not isinstance(value, dt.datetime) or value.tzinfo is not None
+    ):
+        raise HTTPException(
+            detail="Invalid cursor", status_code=status.HTTP_400_BAD_REQUEST
+        )
+    return value, item_id
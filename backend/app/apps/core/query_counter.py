@@ -0,0 +1,34 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from apps.core.base_models import engine
+from fastapi import Request, Response
+from sqlalchemy import event
+
+# every active count_queries block, so they can be nested
+_statements: ContextVar[tuple[list[str], ...]] = ContextVar("statements", default=())
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _collect_statement(conn, cursor, statement, parameters, context, executemany):
+    for statements in _statements.get():
+        statements.append(statement)
+
+
+@contextmanager
+def count_queries() -> Iterator[list[str]]:
+    """Collect SQL statements sent to the database inside the block"""
+    statements: list[str] = []
+    token = _statements.set((*_statements.get(), statements))
+    try:
+        yield statements
+    finally:
+        _statements.reset(token)
+
+
+async def query_count_middleware(request: Request, call_next) -> Response:
+    with count_queries() as statements:
+        response = await call_next(request)
+    response.headers["X-Query-Count"] = str(len(statements))
+    return response
@@ -1,3 +1,4 @@
+from datetime import datetime, timezone
 from enum import IntEnum, StrEnum
 from typing import Optional
 
@@ -14,10 +15,12 @@ class InstanceVersion(BaseModel):
 
 class PaginationResponseSchema(BaseModel):
     items: list
-    total: int
+    total: Optional[int]
     page: int
     limit: int
-    pages: int
+    pages: Optional[int]
+    has_more: bool = False
+    next_cursor: Optional[str] = None
 
 
 class PaginationParamsEnum(IntEnum):
@@ -26,6 +29,29 @@ class PaginationParamsEnum(IntEnum):
     DEFAULT_RESULTS_PER_PAGE = 10
 
 
+class PaginationModeEnum(StrEnum):
+    OFFSET = "offset"
+    CURSOR = "cursor"
+
+
+class CountStrategyEnum(StrEnum):
+    EXACT = "exact"
+    ESTIMATED = "estimated"
+    NONE = "none"
+    CACHED = "cached"
+
+
+class SearchModeEnum(StrEnum):
+    CONTAINS = "contains"
+    FULL_TEXT = "full_text"
+    FUZZY = "fuzzy"
+
+
+class ExportFormatEnum(StrEnum):
+    NDJSON = "ndjson"
+    JSON = "json"
+
+
 class SortEnum(StrEnum):
     ASC = "asc"
     DESC = "desc"
@@ -47,6 +73,18 @@ class SearchParamsSchema(BaseModel):
     sort_direction: SortEnum = Field(default=SortEnum.DESC)
     sort_by: SortFieldEnum = Field(default=SortFieldEnum.ID)
     use_sharp_filter: bool = Field(default=False, description="search exact q")
+    search_mode: SearchModeEnum = Field(
+        default=SearchModeEnum.CONTAINS,
+        description="full_text and fuzzy rank results by relevance in offset mode",
+    )
+    pagination_mode: PaginationModeEnum = Field(default=PaginationModeEnum.OFFSET)
+    cursor: Optional[str] = Field(
+        None, description="next_cursor from the previous page, cursor mode only"
+    )
+    count_strategy: CountStrategyEnum = Field(
+        default=CountStrategyEnum.EXACT,
+        description="how total is computed, none skips it and relies on has_more",
+    )
 
     model_config = ConfigDict(
         str_strip_whitespace=True,
@@ -57,3 +95,31 @@ class SearchParamsSchema(BaseModel):
         if not value:
             return value
         return value.lower()
+
+
+class ExportParamsSchema(BaseModel):
+    export_format: ExportFormatEnum = Field(default=ExportFormatEnum.NDJSON)
+    updated_since: Optional[datetime] = Field(
+        None, description="export only items updated after this moment"
+    )
+
+    @field_validator("updated_since")
+    def to_naive_utc(cls, value: Optional[datetime]) -> Optional[datetime]:
+        # updated_at is a timestamp without time zone, stored in UTC
+        if value is None or value.tzinfo is None:
+            return value
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class BatchPatchStatusEnum(StrEnum):
+    UPDATED = "updated"
+    CONFLICT = "conflict"
+    NOT_FOUND = "not_found"
+
+
+class BatchPatchResultSchema(BaseModel):
+    id: int
+    status: BatchPatchStatusEnum
+    version: Optional[int] = Field(
+        None, description="Current version of the item, for versioned items"
+    )
@@ -2,8 +2,12 @@ import socket
 from asyncio import sleep
 from uuid import uuid4
 
+from apps.auth.password_handler import PasswordEncrypt
+from apps.payments.events import payment_event_queue
 from fastapi import APIRouter, File, UploadFile
-from fastapi_cache.decorator import cache
+from services.payment_service import payment_provider
+from services.redis_service import redis_service
+from services.response_cache import response_cache
 from settings import settings
 from storage.s3 import s3_storage
 
@@ -28,12 +32,33 @@ async def get_database_info() -> DatabaseInfoSchema:
 
 
 @info_router.get("/redis")
-@cache(expire=30, namespace="params")
+@response_cache.cached(namespace="params", ttl=30)
 async def heavy_endpoint(some_param: str) -> dict:
     await sleep(5)
     return {"some_param": some_param * 2}
 
 
+@info_router.get("/password-hashing")
+async def get_password_hashing_info() -> dict:
+    """Get password hashing pool load"""
+    return PasswordEncrypt.get_stats()
+
+
+@info_router.get("/payments")
+async def get_payments_info() -> dict:
+    """Get payment provider load and the webhook events queue"""
+    return {
+        **payment_provider.get_stats(),
+        "events": await payment_event_queue.get_stats(),
+    }
+
+
+@info_router.get("/redis-near-cache")
+async def get_redis_near_cache_info() -> dict:
+    """Get redis near cache hit/miss counters"""
+    return redis_service.near_cache.get_stats()
+
+
 @info_router.post("/test-upload-files")
 async def upload_files(files: list[UploadFile] = File(...)) -> dict:
     uuid_id = uuid4()
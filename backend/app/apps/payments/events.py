@@ -0,0 +1,220 @@
+import asyncio
+import os
+import socket
+import time
+from typing import Awaitable, Callable
+
+import orjson
+import redis.asyncio as redis
+from apps.core.base_models import async_session_maker
+from apps.products.cart_store import cart_store
+from apps.products.crud import order_manager
+from apps.products.models import Order
+from apps.users.models import User  # noqa: F401 orders refer to it, for the worker
+from services.redis_service import redis_service
+from settings import settings
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+EVENTS_STREAM = "payment-events"
+EVENTS_GROUP = "payment-workers"
+RETRY_KEY = "payment-events:retry"
+DEAD_LETTER_KEY = "payment-events:dead"
+
+# KEYS: event dedupe key, events stream
+# ARGV: dedupe ttl in seconds, event
+# the event is queued only the first time its id is seen
+PUBLISH_EVENT_SCRIPT = """
+if not redis.call('SET', KEYS[1], 1, 'NX', 'EX', ARGV[1]) then
+    return 0
+end
+redis.call('XADD', KEYS[2], '*', 'event', ARGV[2])
+return 1
+"""
+
+# KEYS: retry sorted set, events stream
+# ARGV: now timestamp, max events to move
+MOVE_DUE_RETRIES_SCRIPT = """
+local events = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, event in ipairs(events) do
+    redis.call('XADD', KEYS[2], '*', 'event', event)
+    redis.call('ZREM', KEYS[1], event)
+end
+return #events
+"""
+
+
+class PaymentEventError(Exception):
+    """The event can not be processed, retrying would not help"""
+
+
+async def close_paid_order(event_object: dict, session: AsyncSession) -> None:
+    metadata = event_object["metadata"]
+    order_id, user_id = int(metadata["order_id"]), int(metadata["user_id"])
+    order = await order_manager.get(
+        session=session, field=Order.id, field_value=order_id
+    )
+    if not order or order.user_id != user_id:
+        raise PaymentEventError(f"Order {order_id} of user {user_id} not found")
+    if order.is_closed:
+        return
+
+    # compared in minor units, as stripe reports them
+    if int(order.cost * 100) != int(event_object["amount_total"]):
+        raise PaymentEventError(f"Order {order_id} cost is not equal to paid")
+
+    await session.execute(
+        update(Order)
+        .where(Order.id == order_id, Order.is_closed.is_(False))
+        .values(is_closed=True)
+    )
+    await session.commit()
+    await cart_store.clear(user_id=user_id)
+
+
+EVENT_HANDLERS: dict[str, Callable[[dict, AsyncSession], Awaitable[None]]] = {
+    "checkout.session.completed": close_paid_order,
+}
+
+
+class PaymentEventQueue:
+    """Payment provider events, processed outside of the webhook request.
+
+    Events go to a Redis stream read by a consumer group, so every event is
+    handled by one worker and events of a crashed worker are claimed by
+    others. Failed events are retried with exponential backoff through a
+    sorted set and end up in a dead letter list after
+    PAYMENT_EVENT_MAX_ATTEMPTS.
+    """
+
+    def __init__(self):
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self.dedupe_ttl = settings.PAYMENT_EVENT_DEDUPE_TTL_HOURS * 60 * 60
+        self.max_attempts = settings.PAYMENT_EVENT_MAX_ATTEMPTS
+        self.retry_base = settings.PAYMENT_EVENT_RETRY_BASE_SECONDS
+        self.claim_idle_ms = settings.PAYMENT_EVENT_CLAIM_IDLE_SECONDS * 1000
+        self.batch_size = settings.PAYMENT_EVENT_BATCH_SIZE
+        self.publish_event = redis_service.redis.register_script(PUBLISH_EVENT_SCRIPT)
+        self.move_due_retries = redis_service.redis.register_script(
+            MOVE_DUE_RETRIES_SCRIPT
+        )
+        self._worker_task: asyncio.Task | None = None
+
+    @staticmethod
+    def get_dedupe_key(event_id: str) -> str:
+        return f"payment-event:{event_id}"
+
+    async def publish(self, event_id: str, event_type: str, event_object: dict) -> bool:
+        """Queue the event, False if it has been queued already"""
+        event = orjson.dumps(
+            {"id": event_id, "type": event_type, "object": event_object, "attempts": 0}
+        )
+        is_published = await self.publish_event(
+            keys=[self.get_dedupe_key(event_id), EVENTS_STREAM],
+            args=[self.dedupe_ttl, event],
+        )
+        return bool(is_published)
+
+    async def get_stats(self) -> dict:
+        async with redis_service.get_redis() as _redis:
+            pipe = _redis.pipeline(transaction=False)
+            pipe.xlen(EVENTS_STREAM)
+            pipe.zcard(RETRY_KEY)
+            pipe.llen(DEAD_LETTER_KEY)
+            queued, retrying, dead = await pipe.execute()
+        return {"queued": queued, "retrying": retrying, "dead": dead}
+
+    async def start(self) -> None:
+        if self._worker_task is None:
+            self._worker_task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._worker_task is None:
+            return
+        self._worker_task.cancel()
+        try:
+            await self._worker_task
+        except asyncio.CancelledError:
+            pass
+        self._worker_task = None
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self._ensure_group()
+                while True:
+                    await self.process_batch()
+            except (redis.RedisError, OSError):
+                await asyncio.sleep(self.retry_base)
+
+    async def process_batch(self) -> None:
+        async with redis_service.get_redis() as _redis:
+            await self.move_due_retries(
+                keys=[RETRY_KEY, EVENTS_STREAM], args=[time.time(), self.batch_size]
+            )
+            # events of consumers which died before acknowledging them
+            _, entries, *_ = await _redis.xautoclaim(
+                EVENTS_STREAM,
+                EVENTS_GROUP,
+                self.consumer,
+                min_idle_time=self.claim_idle_ms,
+                count=self.batch_size,
+            )
+            if not entries:
+                response = await _redis.xreadgroup(
+                    EVENTS_GROUP,
+                    self.consumer,
+                    streams={EVENTS_STREAM: ">"},
+                    count=self.batch_size,
+                    block=self.retry_base * 1000,
+                )
+                entries = response[0][1] if response else []
+
+        for entry_id, fields in entries:
+            await self._handle(entry_id=entry_id, event=orjson.loads(fields[b"event"]))
+
+    async def _handle(self, entry_id: bytes, event: dict) -> None:
+        handler = EVENT_HANDLERS.get(event["type"])
+        try:
+            if handler is not None:
+                async with async_session_maker() as session:
+                    await handler(event["object"], session)
+        except PaymentEventError as e:
+            await self._dead_letter(event=event, error=str(e))
+        except Exception as e:  # noqa: BLE001
+            await self._retry_later(event=event, error=repr(e))
+
+        async with redis_service.get_redis() as _redis:
+            await _redis.xack(EVENTS_STREAM, EVENTS_GROUP, entry_id)
+            await _redis.xdel(EVENTS_STREAM, entry_id)
+
+    async def _retry_later(self, event: dict, error: str) -> None:
+        event = event | {"attempts": event["attempts"] + 1, "error": error}
+        if event["attempts"] >= self.max_attempts:
+            await self._dead_letter(event=event, error=error)
+            return
+        retry_at = time.time() + self.retry_base * 2 ** (event["attempts"] - 1)
+        async with redis_service.get_redis() as _redis:
+            await _redis.zadd(RETRY_KEY, {orjson.dumps(event): retry_at})
+
+    async def _dead_letter(self, event: dict, error: str) -> None:
+        async with redis_service.get_redis() as _redis:
+            await _redis.lpush(DEAD_LETTER_KEY, orjson.dumps(event | {"error": error}))
+
+    async def _ensure_group(self) -> None:
+        async with redis_service.get_redis() as _redis:
+            try:
+                await _redis.xgroup_create(
+                    EVENTS_STREAM, EVENTS_GROUP, id="0", mkstream=True
+                )
+            except redis.ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+
+
+payment_event_queue = PaymentEventQueue()
+
+
+if __name__ == "__main__":
+    # a dedicated worker process: python -m apps.payments.events
+    asyncio.run(payment_event_queue.run())
@@ -1,15 +1,14 @@
+import orjson
 import stripe
 from fastapi import APIRouter, Depends, HTTPException, Request, status
+from services.payment_service import payment_provider
 from settings import settings
-from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..core.dependencies import get_async_session
 from ..products.crud import order_manager
-from ..products.dependencies import get_order
+from ..products.dependencies import get_order_for_checkout
 from ..products.models import Order
-from ..users.crud import user_manager
-from ..users.models import User
-from .schemas import PaymentUrlSchema, SetOrderToClosedSchema
+from .events import EVENT_HANDLERS, payment_event_queue
+from .schemas import PaymentUrlSchema
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
@@ -18,7 +17,7 @@ payment_router = APIRouter()
 
 @payment_router.get("/get-payment-url")
 async def get_payment_url(
-    request: Request, order: Order = Depends(get_order)
+    request: Request, order: Order = Depends(get_order_for_checkout)
 ) -> PaymentUrlSchema:
     if order.cost < 50:
         raise HTTPException(
@@ -36,61 +35,48 @@ async def get_payment_url(
                     "images": [order_product.product.main_image]
                     + order_product.product.images,
                 },
-                "unit_amount": int(order_product.product.price) * 100,
+                "unit_amount": int(order_product.price * 100),
             },
             "quantity": order_product.quantity,
         }
         for order_product in order.products
     ]
 
-    session_stripe: dict = stripe.checkout.Session.create(
+    checkout_url = await payment_provider.create_checkout_url(
         line_items=line_items,
-        mode="payment",
-        success_url=request.base_url,
+        success_url=str(request.base_url),
         cancel_url=f"{request.base_url}scalar",
         customer_email=order.user.email,
         # locale="uk",
-        metadata={"user_id": order.user.id, "total": order.cost, "order_id": order.id},
+        metadata={
+            "user_id": order.user.id,
+            "total": str(order.cost),
+            "order_id": order.id,
+        },
     )
 
-    return PaymentUrlSchema(url=session_stripe["url"])
+    return PaymentUrlSchema(url=checkout_url)
 
 
 @payment_router.post("/webhook", include_in_schema=settings.DEBUG)
-async def process_payment_stripe(
-    stripe_data: dict, session: AsyncSession = Depends(get_async_session)
-):
-    if not stripe_data:
-        return
+async def process_payment_stripe(request: Request) -> dict:
+    payload = await request.body()
     try:
-        event = stripe.Event.construct_from(stripe_data, settings.STRIPE_SECRET_KEY)
-    except stripe.error.SignatureVerificationError:
+        event = stripe.Webhook.construct_event(
+            payload,
+            request.headers.get("stripe-signature", ""),
+            settings.STRIPE_WEBHOOK_SECRET,
+        )
+    except (ValueError, stripe.SignatureVerificationError):
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="No stripe data"
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid stripe event"
         )
 
-    if not event["type"] == "checkout.session.completed":
-        return
-
-    user_id = int(event["data"]["object"]["metadata"]["user_id"])
-    user = await user_manager.get(session=session, field=User.id, field_value=user_id)
-    if not user:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No user")
-
-    order = await order_manager.get_or_create(
-        user_id=user_id, session=session, is_closed=False
-    )
-    if order.id != int(event["data"]["object"]["metadata"]["order_id"]):
-        raise ValueError("Outdated order")
-
-    paid = float(stripe_data["data"]["object"]["amount_total"]) / 100
-    if order.cost != paid:
-        raise ValueError("order cost is not equal to paid")
-
-    await order_manager.patch(
-        instance_id=order.id,
-        session=session,
-        data_to_patch=SetOrderToClosedSchema(),
-        exclude_unset=False,
-    )
-    return {f"{order.id=} closed": True}
+    # acknowledged right away, stripe redelivers the event on a slow response
+    if event["type"] in EVENT_HANDLERS:
+        await payment_event_queue.publish(
+            event_id=event["id"],
+            event_type=event["type"],
+            event_object=orjson.loads(payload)["data"]["object"],
+        )
+    return {"received": True}
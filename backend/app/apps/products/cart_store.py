@@ -0,0 +1,319 @@
+import asyncio
+from decimal import Decimal
+
+import orjson
+import redis.asyncio as redis
+from apps.core.base_models import async_session_maker
+from apps.products.crud import order_manager
+from apps.products.models import Order, OrderProduct, Product
+from apps.products.schemas import OrderProductsSchema, OrderSchema, SavedProductSchema
+from fastapi import HTTPException, status
+from services.redis_service import redis_service
+from settings import settings
+from sqlalchemy import Integer, Numeric, and_, column, func, select, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+DIRTY_CARTS_KEY = "cart-dirty"
+ORDER_FIELD = b"order"
+QUANTITY_PREFIX = b"q:"
+SNAPSHOT_PREFIX = b"p:"
+CART_MISSING = -1
+CHANGE_QUANTITY_ATTEMPTS = 3
+
+# KEYS: cart hash
+# ARGV: cart ttl in seconds, then field/value pairs
+# loads the cart from postgres only if a concurrent change has not done it
+# yet, lines left in a hash without an order are newer and are kept
+HYDRATE_CART_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], 'order') == 1 then
+    return 0
+end
+for i = 2, #ARGV, 2 do
+    redis.call('HSETNX', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+# KEYS: cart hash, dirty carts set
+# ARGV: product id, quantity delta, "1" to set the quantity, product snapshot,
+#       cart ttl in seconds, user id
+# returns -1 without changes if the cart was cleared or expired since loaded
+CHANGE_QUANTITY_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], 'order') == 0 then
+    return -1
+end
+local quantity = tonumber(ARGV[2])
+if ARGV[3] ~= '1' then
+    quantity = quantity + (tonumber(redis.call('HGET', KEYS[1], 'q:' .. ARGV[1])) or 0)
+end
+if quantity < 0 then
+    quantity = 0
+end
+redis.call('HSET', KEYS[1], 'q:' .. ARGV[1], quantity, 'p:' .. ARGV[1], ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+redis.call('SADD', KEYS[2], ARGV[6])
+return quantity
+"""
+
+
+class CartStore:
+    """Open carts kept in Redis and written behind to Postgres.
+
+    A cart is a hash per user: the order it belongs to, and per product the
+    quantity and a snapshot of the product with its price. Changed carts are
+    marked dirty and persisted by a background flusher every
+    CART_FLUSH_INTERVAL_SECONDS, on checkout, or right away with
+    CART_WRITE_THROUGH.
+    """
+
+    def __init__(self):
+        self.ttl = settings.CART_TTL_HOURS * 60 * 60
+        self.flush_interval = settings.CART_FLUSH_INTERVAL_SECONDS
+        self.flush_batch_size = settings.CART_FLUSH_BATCH_SIZE
+        self.write_through = settings.CART_WRITE_THROUGH
+        self.hydrate_cart = redis_service.redis.register_script(HYDRATE_CART_SCRIPT)
+        self.change_cart_quantity = redis_service.redis.register_script(
+            CHANGE_QUANTITY_SCRIPT
+        )
+        self._flusher_task: asyncio.Task | None = None
+
+    @staticmethod
+    def get_cart_key(user_id: int) -> str:
+        return f"cart:{user_id}"
+
+    async def get_order(self, user_id: int, session: AsyncSession) -> OrderSchema:
+        cart = await self._load(user_id=user_id, session=session)
+        order = orjson.loads(cart[ORDER_FIELD])
+        products = []
+        cost = Decimal(0)
+        for field, quantity in cart.items():
+            if not field.startswith(QUANTITY_PREFIX) or not int(quantity):
+                continue
+            snapshot = orjson.loads(cart[SNAPSHOT_PREFIX + field[2:]])
+            price = Decimal(snapshot["price"])
+            cost += price * int(quantity)
+            products.append(
+                OrderProductsSchema(
+                    price=price,
+                    quantity=int(quantity),
+                    total=price * int(quantity),
+                    product=SavedProductSchema.model_validate(snapshot["product"]),
+                )
+            )
+        return OrderSchema(
+            created_at=order["created_at"],
+            is_closed=False,
+            user_id=user_id,
+            cost=cost,
+            products=products,
+        )
+
+    async def change_quantity(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        product: Product,
+        quantity: int,
+        is_set_quantity_mode: bool,
+    ) -> None:
+        snapshot = {
+            "price": str(product.price),
+            "product": SavedProductSchema.model_validate(product).model_dump(
+                mode="json"
+            ),
+        }
+        for _ in range(CHANGE_QUANTITY_ATTEMPTS):
+            await self._load(user_id=user_id, session=session)
+            new_quantity = await self.change_cart_quantity(
+                keys=[self.get_cart_key(user_id), DIRTY_CARTS_KEY],
+                args=[
+                    product.id,
+                    quantity,
+                    int(is_set_quantity_mode),
+                    orjson.dumps(snapshot),
+                    self.ttl,
+                    user_id,
+                ],
+            )
+            if new_quantity != CART_MISSING:
+                break
+        else:
+            raise HTTPException(
+                detail="Cart was changed concurrently, try again",
+                status_code=status.HTTP_409_CONFLICT,
+            )
+        if self.write_through:
+            await self.flush(user_id=user_id, session=session)
+
+    async def flush(self, user_id: int, session: AsyncSession) -> None:
+        """Persist the cart of the user into its order"""
+        async with redis_service.get_redis() as _redis:
+            # unmarked first, a change made during the flush marks it again
+            await _redis.srem(DIRTY_CARTS_KEY, user_id)
+            cart: dict[bytes, bytes] = await _redis.hgetall(self.get_cart_key(user_id))
+        if ORDER_FIELD not in cart:
+            # cleared or expired, there is no open order to write it to
+            return
+
+        order_id = orjson.loads(cart[ORDER_FIELD])["id"]
+        lines = [
+            (
+                int(field[2:]),
+                Decimal(orjson.loads(cart[SNAPSHOT_PREFIX + field[2:]])["price"]),
+                int(quantity),
+            )
+            for field, quantity in cart.items()
+            if field.startswith(QUANTITY_PREFIX)
+        ]
+        if not lines:
+            return
+
+        cart_lines = values(
+            column("product_id", Integer),
+            column("price", Numeric(12, 2)),
+            column("quantity", Integer),
+            name="cart_lines",
+        ).data(lines)
+        # lines of deleted products, or of an order closed meanwhile, are skipped
+        persistable_lines = (
+            select(
+                Order.id,
+                cart_lines.c.product_id,
+                cart_lines.c.price,
+                cart_lines.c.quantity,
+            )
+            .select_from(cart_lines)
+            .join(Product, Product.id == cart_lines.c.product_id)
+            .join(Order, and_(Order.id == order_id, Order.is_closed.is_(False)))
+            # a concurrent close waits for the flush, or is seen by it
+            .with_for_update(read=True, of=Order)
+        )
+        query = insert(OrderProduct).from_select(
+            ["order_id", "product_id", "price", "quantity"], persistable_lines
+        )
+        query = query.on_conflict_do_update(
+            constraint="uq_order_product",
+            set_={
+                "quantity": query.excluded.quantity,
+                "price": query.excluded.price,
+                "updated_at": func.now(),
+            },
+        ).returning(OrderProduct.product_id)
+        try:
+            persisted = set((await session.scalars(query)).all())
+            await session.commit()
+        except Exception:
+            async with redis_service.get_redis() as _redis:
+                await _redis.sadd(DIRTY_CARTS_KEY, user_id)
+            raise
+
+        dropped = [
+            product_id for product_id, *_ in lines if product_id not in persisted
+        ]
+        if dropped:
+            await self._drop_lines(
+                user_id=user_id, order_id=order_id, product_ids=dropped, session=session
+            )
+
+    async def _drop_lines(
+        self, user_id: int, order_id: int, product_ids: list[int], session: AsyncSession
+    ) -> None:
+        is_closed = await session.scalar(
+            select(Order.is_closed).where(Order.id == order_id)
+        )
+        if is_closed is not False:
+            # the order is closed or gone, the cart is reloaded with a new one
+            await self.clear(user_id=user_id)
+            return
+        fields = [
+            prefix + str(product_id).encode()
+            for product_id in product_ids
+            for prefix in (QUANTITY_PREFIX, SNAPSHOT_PREFIX)
+        ]
+        async with redis_service.get_redis() as _redis:
+            await _redis.hdel(self.get_cart_key(user_id), *fields)
+
+    async def clear(self, user_id: int) -> None:
+        await redis_service.delete_cache(self.get_cart_key(user_id))
+
+    async def flush_dirty(self) -> None:
+        while True:
+            async with redis_service.get_redis() as _redis:
+                user_ids = await _redis.spop(DIRTY_CARTS_KEY, self.flush_batch_size)
+            if not user_ids:
+                return
+            has_failed = False
+            for user_id in user_ids:
+                try:
+                    async with async_session_maker() as session:
+                        await self.flush(user_id=int(user_id), session=session)
+                except Exception:  # noqa: BLE001
+                    # marked dirty again by flush, retried on the next run
+                    has_failed = True
+            if has_failed:
+                return
+
+    async def start(self) -> None:
+        if self._flusher_task is None:
+            self._flusher_task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._flusher_task is None:
+            return
+        self._flusher_task.cancel()
+        try:
+            await self._flusher_task
+        except asyncio.CancelledError:
+            pass
+        self._flusher_task = None
+        # whatever is still dirty is written before the worker goes away
+        await self.flush_dirty()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush_dirty()
+            except (redis.RedisError, OSError):
+                pass
+
+    async def _load(self, user_id: int, session: AsyncSession) -> dict[bytes, bytes]:
+        cart_key = self.get_cart_key(user_id)
+        async with redis_service.get_redis() as _redis:
+            cart = await _redis.hgetall(cart_key)
+        if ORDER_FIELD in cart:
+            return cart
+
+        order = await order_manager.get_or_create(
+            session=session,
+            user_id=user_id,
+            is_closed=False,
+            options=order_manager.with_products_options,
+        )
+        fields: list = [
+            ORDER_FIELD,
+            orjson.dumps({"id": order.id, "created_at": order.created_at}),
+        ]
+        for order_product in order.products:
+            snapshot = {
+                "price": str(order_product.price),
+                "product": SavedProductSchema.model_validate(
+                    order_product.product
+                ).model_dump(mode="json"),
+            }
+            fields.extend(
+                (
+                    QUANTITY_PREFIX + str(order_product.product_id).encode(),
+                    order_product.quantity,
+                    SNAPSHOT_PREFIX + str(order_product.product_id).encode(),
+                    orjson.dumps(snapshot),
+                )
+            )
+        await self.hydrate_cart(keys=[cart_key], args=[self.ttl, *fields])
+        async with redis_service.get_redis() as _redis:
+            return await _redis.hgetall(cart_key)
+
+
+cart_store = CartStore()
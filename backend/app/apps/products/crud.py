@@ -1,7 +1,9 @@
 from apps.core.base_crud import BaseCRUDManager
-from sqlalchemy import select
+from sqlalchemy import func, literal, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.sql.base import ExecutableOption
 
 from .models import Category, Order, OrderProduct, Product
 
@@ -20,16 +22,24 @@ class OrderCRUDManager(BaseCRUDManager):
     def __init__(self):
         self.model = Order
 
+    @property
+    def with_products_options(self) -> tuple[ExecutableOption, ...]:
+        # relationships are lazy="raise", every query path loads what it needs;
+        # built on use, so importing this module does not configure the mappers
+        return (
+            selectinload(Order.products).joinedload(OrderProduct.product),
+            joinedload(Order.user, innerjoin=True),
+        )
+
     async def get_order_with_products(
         self, session: AsyncSession | None, order: int | Order
     ) -> Order:
         if isinstance(order, int):
             result = await session.execute(
                 select(self.model)
-                .options(
-                    selectinload(self.model.products).selectinload(OrderProduct.product)
-                )
+                .options(*self.with_products_options)
                 .filter(self.model.id == order)
+                .execution_options(populate_existing=True)
             )
             order = result.scalars().first()
         if order.products:
@@ -46,27 +56,34 @@ class OrderProductCRUDManager(BaseCRUDManager):
         self,
         session: AsyncSession,
         order: Order,
-        product: Product,
+        product_id: int,
         quantity: int,
         is_set_quantity_mode: bool,
-    ) -> None:
-        order_product: OrderProduct | None = await self.get_or_create(
-            session=session,
-            order_id=order.id,
-            product_id=product.id,
+    ) -> bool:
+        """Upsert the order line in one statement, False if there is no product"""
+        query = insert(self.model).from_select(
+            ["order_id", "product_id", "price", "quantity"],
+            select(
+                literal(order.id), Product.id, Product.price, literal(max(quantity, 0))
+            ).filter(Product.id == product_id),
         )
         if is_set_quantity_mode:
-            order_product.quantity = quantity
+            new_quantity = query.excluded.quantity
         else:
-            order_product.quantity += quantity
-            if order_product.quantity < 0:
-                order_product.quantity = 0
-
-        order_product.current_price = product.price
-        session.add(order_product)
+            # concurrent changes add up instead of overwriting each other
+            new_quantity = func.greatest(self.model.quantity + quantity, 0)
+        query = query.on_conflict_do_update(
+            constraint="uq_order_product",
+            set_={
+                "quantity": new_quantity,
+                "price": query.excluded.price,
+                "updated_at": func.now(),
+            },
+        ).returning(self.model.id)
+        result = await session.execute(query)
+        order_product_id = result.scalar_one_or_none()
         await session.commit()
-        await session.refresh(order_product)
-        await session.refresh(order)
+        return order_product_id is not None
 
 
 category_manager = CategoryCRUDManager()
@@ -2,10 +2,12 @@ import re
 
 from apps.auth.dependencies import get_current_user
 from apps.core.dependencies import get_async_session
+from apps.products.cart_store import cart_store
 from apps.products.crud import order_manager, product_manager
 from apps.products.models import Order, Product
 from apps.users.models import User
 from fastapi import Body, Depends, File, HTTPException, UploadFile, status
+from settings import settings
 from sqlalchemy.ext.asyncio import AsyncSession
 
 ALLOWED_IMAGE_FILE_TYPES = {"image/jpeg", "image/png", "image/gif"}
@@ -61,6 +63,27 @@ async def validate_images(
 async def get_order(
     user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_async_session),
+) -> Order:
+    return await order_manager.get_or_create(
+        session=session,
+        user_id=user.id,
+        is_closed=False,
+        options=order_manager.with_products_options,
+    )
+
+
+async def get_order_for_checkout(
+    user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> Order:
+    if settings.CART_REDIS_ENABLED:
+        await cart_store.flush(user_id=user.id, session=session)
+    return await get_order(user=user, session=session)
+
+
+async def get_order_without_products(
+    user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
 ) -> Order:
     return await order_manager.get_or_create(
         session=session, user_id=user.id, is_closed=False
@@ -0,0 +1,256 @@
+import csv
+import io
+import time
+import uuid
+from itertools import islice
+from typing import Any, Iterator
+
+import orjson
+from apps.products.models import Category
+from apps.products.schemas import (
+    ImportFormatEnum,
+    ImportProductSchema,
+    ProductImportErrorSchema,
+    ProductImportResultSchema,
+)
+from fastapi import HTTPException, UploadFile, status
+from pydantic import ValidationError
+from settings import settings
+from sqlalchemy import or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+STAGING_TABLE = "product_import"
+STAGING_COLUMNS = (
+    "row_number",
+    "title",
+    "description",
+    "price",
+    "main_image",
+    "images",
+    "category_id",
+    "uuid_data",
+)
+
+CREATE_STAGING_TABLE = f"""
+CREATE TEMP TABLE {STAGING_TABLE} (
+    row_number integer NOT NULL,
+    title varchar(70) NOT NULL,
+    description varchar(2048) NOT NULL,
+    price numeric(12, 2) NOT NULL,
+    main_image varchar NOT NULL,
+    images varchar[] NOT NULL,
+    category_id integer NOT NULL,
+    uuid_data uuid NOT NULL
+) ON COMMIT DROP
+"""
+
+# products are matched by title, the last row of a repeated title wins
+LATEST_STAGED_ROWS = f"""
+SELECT DISTINCT ON (title) *
+FROM {STAGING_TABLE}
+ORDER BY title, row_number DESC
+"""
+
+UPDATE_EXISTING_PRODUCTS = f"""
+UPDATE products AS p
+SET description = s.description,
+    price = s.price,
+    main_image = s.main_image,
+    images = s.images,
+    category_id = s.category_id,
+    updated_at = now()
+FROM ({LATEST_STAGED_ROWS}) AS s
+WHERE p.title = s.title
+"""
+
+INSERT_NEW_PRODUCTS = f"""
+INSERT INTO products (
+    title, description, price, main_image, images, category_id, uuid_data,
+    created_at, updated_at
+)
+SELECT s.title, s.description, s.price, s.main_image, s.images, s.category_id,
+    s.uuid_data, now(), now()
+FROM ({LATEST_STAGED_ROWS}) AS s
+WHERE NOT EXISTS (SELECT 1 FROM products AS p WHERE p.title = s.title)
+"""
+
+
+class ProductImporter:
+    """Bulk product import from a CSV or NDJSON file.
+
+    Rows are validated in batches, their categories are resolved with one
+    query per batch and valid rows are copied into a temporary staging table.
+    The staging table is then merged into products with two set based
+    statements inside the same transaction.
+    """
+
+    def __init__(self, session: AsyncSession, import_format: ImportFormatEnum):
+        self.session = session
+        self.import_format = import_format
+        self.batch_size = settings.PRODUCT_IMPORT_BATCH_SIZE
+        self.max_reported_errors = settings.PRODUCT_IMPORT_MAX_REPORTED_ERRORS
+        self.category_ids: set[int] = set()
+        self.category_names: dict[str, int] = {}
+        self.checked_category_ids: set[int] = set()
+        self.checked_category_names: set[str] = set()
+        self.processed = 0
+        self.failed = 0
+        self.errors: list[ProductImportErrorSchema] = []
+
+    async def run(self, file: UploadFile) -> ProductImportResultSchema:
+        started_at = time.perf_counter()
+        await self.session.execute(text(CREATE_STAGING_TABLE))
+        connection = await self._get_driver_connection()
+
+        rows = self._read_rows(file)
+        while batch := await run_in_threadpool(
+            lambda: list(islice(rows, self.batch_size))
+        ):
+            records = await self._validate_batch(batch)
+            if records:
+                await connection.copy_records_to_table(
+                    STAGING_TABLE, records=records, columns=STAGING_COLUMNS
+                )
+
+        await self.session.execute(
+            text("SELECT pg_advisory_xact_lock(hashtext(:name))"),
+            {"name": STAGING_TABLE},
+        )
+        updated = (await self.session.execute(text(UPDATE_EXISTING_PRODUCTS))).rowcount
+        inserted = (await self.session.execute(text(INSERT_NEW_PRODUCTS))).rowcount
+        await self.session.commit()
+
+        duration = time.perf_counter() - started_at
+        return ProductImportResultSchema(
+            processed=self.processed,
+            inserted=inserted,
+            updated=updated,
+            failed=self.failed,
+            errors=self.errors,
+            duration_seconds=round(duration, 3),
+            rows_per_second=round(self.processed / duration, 1) if duration else 0,
+        )
+
+    async def _get_driver_connection(self) -> Any:
+        connection = await self.session.connection()
+        raw_connection = await connection.get_raw_connection()
+        return raw_connection.driver_connection
+
+    def _read_rows(
+        self, file: UploadFile
+    ) -> Iterator[tuple[int, dict | None, str | None]]:
+        # the upload is spooled to disk, rows are read from it lazily
+        stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+        try:
+            if self.import_format == ImportFormatEnum.CSV:
+                yield from self._read_csv_rows(stream)
+                return
+
+            for row_number, line in enumerate(stream, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield row_number, orjson.loads(line), None
+                except orjson.JSONDecodeError as e:
+                    yield row_number, None, f"Invalid JSON: {e}"
+        except UnicodeDecodeError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="File is not UTF-8 encoded",
+            )
+        finally:
+            # leave closing the upload to fastapi
+            stream.detach()
+
+    @staticmethod
+    def _read_csv_rows(
+        stream: io.TextIOWrapper,
+    ) -> Iterator[tuple[int, dict | None, str | None]]:
+        reader = csv.DictReader(stream)
+        row_number = 0
+        while True:
+            row_number += 1
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                # a malformed line, such as a NUL byte or an oversized field,
+                # is skipped and reading goes on with the next one
+                yield row_number, None, f"Invalid CSV: {e}"
+                continue
+            yield row_number, row, None
+
+    async def _validate_batch(
+        self, batch: list[tuple[int, dict | None, str | None]]
+    ) -> list[tuple]:
+        products: list[tuple[int, ImportProductSchema]] = []
+        for row_number, row, error in batch:
+            self.processed += 1
+            if error is not None:
+                self._add_error(row_number, error)
+                continue
+            try:
+                products.append((row_number, ImportProductSchema.model_validate(row)))
+            except ValidationError as e:
+                self._add_error(
+                    row_number,
+                    "; ".join(
+                        f"{'.'.join(map(str, err['loc'])) or 'row'}: {err['msg']}"
+                        for err in e.errors()
+                    ),
+                )
+
+        await self._resolve_categories([product for _, product in products])
+
+        records = []
+        for row_number, product in products:
+            if product.category_id is not None:
+                category_id = (
+                    product.category_id
+                    if product.category_id in self.category_ids
+                    else None
+                )
+            else:
+                category_id = self.category_names.get(product.category_name)
+            if category_id is None:
+                self._add_error(row_number, "Category not found")
+                continue
+            records.append(
+                (
+                    row_number,
+                    product.title,
+                    product.description,
+                    product.price,
+                    product.main_image,
+                    product.images,
+                    category_id,
+                    uuid.uuid4(),
+                )
+            )
+        return records
+
+    async def _resolve_categories(self, products: list[ImportProductSchema]) -> None:
+        ids = {product.category_id for product in products} - {None}
+        names = {product.category_name for product in products} - {None}
+        ids -= self.checked_category_ids
+        names -= self.checked_category_names
+        if not ids and not names:
+            return
+
+        result = await self.session.execute(
+            select(Category.id, Category.name).filter(
+                or_(Category.id.in_(ids), Category.name.in_(names))
+            )
+        )
+        for category_id, name in result.all():
+            self.category_ids.add(category_id)
+            self.category_names[name] = category_id
+        self.checked_category_ids |= ids
+        self.checked_category_names |= names
+
+    def _add_error(self, row_number: int, detail: str) -> None:
+        self.failed += 1
+        if len(self.errors) < self.max_reported_errors:
+            self.errors.append(ProductImportErrorSchema(row=row_number, detail=detail))
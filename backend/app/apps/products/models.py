@@ -1,7 +1,19 @@
+from decimal import Decimal
+
 from apps.core.base_models import Base, UpdatedAtMixin, UUIDMixin
-from sqlalchemy import ForeignKey, Integer, String, UniqueConstraint
-from sqlalchemy.dialects.postgresql import ARRAY
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import (
+    Computed,
+    ForeignKey,
+    Index,
+    Integer,
+    Numeric,
+    String,
+    UniqueConstraint,
+    func,
+    select,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
+from sqlalchemy.orm import Mapped, column_property, mapped_column, relationship
 
 
 class Category(UpdatedAtMixin, Base):
@@ -9,7 +21,17 @@ class Category(UpdatedAtMixin, Base):
 
     name: Mapped[str] = mapped_column(String(70), unique=True, nullable=False)
     version: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
-    products = relationship("Product", back_populates="category")
+    products = relationship("Product", back_populates="category", lazy="raise")
+
+    __table_args__ = (
+        Index("ix_categories_updated_at_id", "updated_at", "id"),
+        Index(
+            "ix_categories_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
 
     def __str__(self) -> str:
         return f"<Category {self.name} - #{self.version}>"
@@ -18,16 +40,36 @@ class Category(UpdatedAtMixin, Base):
 class Product(UpdatedAtMixin, UUIDMixin, Base):
     title: Mapped[str] = mapped_column(String(70), nullable=False)
     description: Mapped[str] = mapped_column(String(2048), default="")
-    price: Mapped[float] = mapped_column(nullable=False)
+    price: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False)
     main_image: Mapped[str] = mapped_column(nullable=False)
     images: Mapped[list[str]] = mapped_column(ARRAY(String), default=list)
     category_id: Mapped[int] = mapped_column(
         ForeignKey("categories.id", ondelete="RESTRICT"), nullable=False
     )
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(description, '')), 'B')",
+            persisted=True,
+        ),
+        deferred=True,
+    )
 
-    category = relationship("Category", back_populates="products")
+    category = relationship("Category", back_populates="products", lazy="raise")
     order_products = relationship(
-        "OrderProduct", back_populates="product", lazy="selectin"
+        "OrderProduct", back_populates="product", lazy="raise"
+    )
+
+    __table_args__ = (
+        Index("ix_products_updated_at_id", "updated_at", "id"),
+        Index("ix_products_search_vector", "search_vector", postgresql_using="gin"),
+        Index(
+            "ix_products_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
     )
 
     def __str__(self) -> str:
@@ -37,28 +79,37 @@ class Product(UpdatedAtMixin, UUIDMixin, Base):
 class Order(UpdatedAtMixin, UUIDMixin, Base):
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     is_closed: Mapped[bool] = mapped_column(default=False)
-    user = relationship("User", back_populates="orders")
-    products = relationship("OrderProduct", back_populates="order", lazy="selectin")
+    user = relationship("User", back_populates="orders", lazy="raise")
+    products = relationship("OrderProduct", back_populates="order", lazy="raise")
 
     @property
-    def cost(self) -> float:
-        return sum([product.total for product in self.products])
+    def cost(self) -> Decimal:
+        return self.total
 
 
 class OrderProduct(UpdatedAtMixin, Base):
     order_id: Mapped[int] = mapped_column(ForeignKey("orders.id"))
     product_id: Mapped[int] = mapped_column(ForeignKey("products.id"))
 
-    price: Mapped[float] = mapped_column(default=0.0)
+    price: Mapped[Decimal] = mapped_column(Numeric(12, 2), default=0)
     quantity: Mapped[int] = mapped_column(default=0)
 
-    order = relationship("Order", back_populates="products", lazy="selectin")
-    product = relationship("Product", back_populates="order_products", lazy="selectin")
+    order = relationship("Order", back_populates="products", lazy="raise")
+    product = relationship("Product", back_populates="order_products", lazy="raise")
 
     __table_args__ = (
         UniqueConstraint("order_id", "product_id", name="uq_order_product"),
     )
 
     @property
-    def total(self) -> float:
+    def total(self) -> Decimal:
         return self.price * self.quantity
+
+
+# summed in sql, so the total is known without loading the order lines
+Order.total = column_property(
+    select(func.coalesce(func.sum(OrderProduct.price * OrderProduct.quantity), 0))
+    .where(OrderProduct.order_id == Order.id)
+    .correlate_except(OrderProduct)
+    .scalar_subquery()
+)
@@ -1,9 +1,17 @@
 import uuid
+from decimal import Decimal
 from typing import Annotated
 
-from apps.auth.dependencies import require_permissions
+from apps.auth.dependencies import get_current_user, require_permissions
 from apps.core.dependencies import get_async_session
-from apps.core.schemas import SearchParamsSchema
+from apps.core.export import export_response
+from apps.core.schemas import (
+    BatchPatchResultSchema,
+    ExportParamsSchema,
+    PaginationResponseSchema,
+    SearchParamsSchema,
+)
+from apps.products.cart_store import cart_store
 from apps.products.crud import (
     Category,
     category_manager,
@@ -13,32 +21,46 @@ from apps.products.crud import (
 )
 from apps.products.dependencies import (
     get_order,
+    get_order_without_products,
     get_product,
     validate_image,
     validate_images,
 )
-from apps.products.models import Order, Product
+from apps.products.importer import ProductImporter
+from apps.products.models import Product
 from apps.products.schemas import (
+    BatchPatchCategoryItemSchema,
+    BatchPatchProductItemSchema,
+    ImportFormatEnum,
     ModeChangeOrderProductQuantityEnum,
     NewCategory,
     OrderSchema,
     PaginatorSavedCategoryResponseSchema,
     PaginatorSavedProductResponseSchema,
     PatchCategorySchema,
+    ProductImportResultSchema,
     SavedCategorySchema,
     SavedProductSchema,
 )
 from apps.users.constants import UserPermissionsEnum
+from apps.users.models import User
 from fastapi import (
     APIRouter,
     Body,
     Depends,
+    File,
     Form,
     HTTPException,
     Path,
+    Query,
+    Request,
+    Response,
     UploadFile,
     status,
 )
+from fastapi.responses import StreamingResponse
+from services.response_cache import response_cache
+from settings import settings
 from sqlalchemy.ext.asyncio import AsyncSession
 from storage.s3 import s3_storage
 
@@ -68,37 +90,90 @@ async def create_category(
     saved_category = await category_manager.create(
         **new_category.model_dump(), session=session
     )
+    await response_cache.invalidate(Category.__tablename__)
     return saved_category
 
 
-@router_categories.get("/{id}")
+@router_categories.get("/export", response_class=StreamingResponse)
+async def export_categories(
+    params: Annotated[ExportParamsSchema, Depends()],
+    session: AsyncSession = Depends(get_async_session),
+) -> StreamingResponse:
+    """Stream all categories as NDJSON or a JSON array"""
+    chunks = category_manager.stream_items(
+        session=session,
+        targeted_schema=SavedCategorySchema,
+        updated_since=params.updated_since,
+    )
+    return await export_response(
+        chunks=chunks, export_format=params.export_format, filename="categories"
+    )
+
+
+@router_categories.get("/{id}", response_model=SavedCategorySchema)
 async def get_category_by_id(
+    request: Request,
     category_id: int = Path(..., description="The id of the item", ge=1, alias="id"),
     session: AsyncSession = Depends(get_async_session),
-) -> SavedCategorySchema:
-    saved_category = await category_manager.get(
-        session=session, field=Category.id, field_value=category_id
-    )
-    if not saved_category:
-        raise HTTPException(
-            detail="Category with this id not found",
-            status_code=status.HTTP_404_NOT_FOUND,
+) -> Response:
+    async def load_category() -> Category:
+        saved_category = await category_manager.get(
+            session=session, field=Category.id, field_value=category_id
         )
-    return saved_category
+        if not saved_category:
+            raise HTTPException(
+                detail="Category with this id not found",
+                status_code=status.HTTP_404_NOT_FOUND,
+            )
+        return saved_category
+
+    return await response_cache.get_or_set(
+        namespace=Category.__tablename__,
+        key=f"id:{category_id}",
+        loader=load_category,
+        schema=SavedCategorySchema,
+        request=request,
+    )
 
 
-@router_categories.get("/")
+@router_categories.get("/", response_model=PaginatorSavedCategoryResponseSchema)
 async def get_categories(
     params: Annotated[SearchParamsSchema, Depends()],
+    request: Request,
     session: AsyncSession = Depends(get_async_session),
-) -> PaginatorSavedCategoryResponseSchema:
-    result = await category_manager.get_items_paginated(
-        session=session,
-        params=params,
-        targeted_schema=SavedCategorySchema,
-        search_fields=[Category.name],
+) -> Response:
+    async def load_categories() -> PaginationResponseSchema:
+        return await category_manager.get_items_paginated(
+            session=session,
+            params=params,
+            targeted_schema=SavedCategorySchema,
+            search_fields=[Category.name],
+            projection=True,
+        )
+
+    return await response_cache.get_or_set(
+        namespace=Category.__tablename__,
+        key=f"list:{response_cache.get_params_key(params)}",
+        loader=load_categories,
+        request=request,
     )
-    return result
+
+
+@router_categories.patch(
+    "/batch",
+    status_code=status.HTTP_200_OK,
+    dependencies=[
+        Depends(require_permissions([UserPermissionsEnum.CAN_CREATE_CATEGORY]))
+    ],
+)
+async def batch_update_categories(
+    items: list[BatchPatchCategoryItemSchema] = Body(min_length=1, max_length=1000),
+    session: AsyncSession = Depends(get_async_session),
+) -> list[BatchPatchResultSchema]:
+    """Update many categories in one transaction, reporting conflicts per item"""
+    results = await category_manager.patch_many(session=session, items=items)
+    await response_cache.invalidate(Category.__tablename__)
+    return results
 
 
 @router_categories.patch(
@@ -116,6 +191,7 @@ async def update_category(
     updated_category = await category_manager.patch(
         session=session, instance_id=category_id, data_to_patch=patch_data
     )
+    await response_cache.invalidate(Category.__tablename__)
     return updated_category
 
 
@@ -131,6 +207,7 @@ async def delete_category(
     session: AsyncSession = Depends(get_async_session),
 ):
     await category_manager.delete_item(session=session, instance_id=category_id)
+    await response_cache.invalidate(Category.__tablename__)
 
 
 @router_products.post(
@@ -143,7 +220,7 @@ async def delete_category(
 async def create_product(
     title: str = Form(min_length=3, max_length=200),
     description: str = Form(min_length=3, max_length=2048),
-    price: float = Form(ge=0.01),
+    price: Decimal = Form(ge=Decimal("0.01"), max_digits=12, decimal_places=2),
     category_id: int = Form(gt=0),
     main_image: UploadFile = Depends(validate_image),
     images: list[UploadFile] | None = Depends(validate_images),
@@ -207,37 +284,109 @@ async def create_product(
         category_id=category_id,
         session=session,
     )
+    await response_cache.invalidate(Product.__tablename__)
     return SavedProductSchema.model_validate(created_product)
 
 
-@router_products.get("/{id}")
+@router_products.post(
+    "/import",
+    status_code=status.HTTP_200_OK,
+    dependencies=[
+        Depends(require_permissions([UserPermissionsEnum.CAN_CREATE_PRODUCT]))
+    ],
+)
+async def import_products(
+    file: UploadFile = File(...),
+    import_format: ImportFormatEnum = Query(default=ImportFormatEnum.CSV),
+    session: AsyncSession = Depends(get_async_session),
+) -> ProductImportResultSchema:
+    """Create or update products by title from a CSV or NDJSON file"""
+    importer = ProductImporter(session=session, import_format=import_format)
+    result = await importer.run(file)
+    await response_cache.invalidate(Product.__tablename__)
+    return result
+
+
+@router_products.get("/export", response_class=StreamingResponse)
+async def export_products(
+    params: Annotated[ExportParamsSchema, Depends()],
+    session: AsyncSession = Depends(get_async_session),
+) -> StreamingResponse:
+    """Stream all products as NDJSON or a JSON array"""
+    chunks = product_manager.stream_items(
+        session=session,
+        targeted_schema=SavedProductSchema,
+        updated_since=params.updated_since,
+    )
+    return await export_response(
+        chunks=chunks, export_format=params.export_format, filename="products"
+    )
+
+
+@router_products.get("/{id}", response_model=SavedProductSchema)
 async def get_product_by_id(
+    request: Request,
     product_id: int = Path(..., description="The id of the item", ge=1, alias="id"),
     session: AsyncSession = Depends(get_async_session),
-) -> SavedProductSchema:
-    saved_product = await product_manager.get(
-        session=session, field=Product.id, field_value=product_id
-    )
-    if not saved_product:
-        raise HTTPException(
-            detail="Product with this id not found",
-            status_code=status.HTTP_404_NOT_FOUND,
+) -> Response:
+    async def load_product() -> Product:
+        saved_product = await product_manager.get(
+            session=session, field=Product.id, field_value=product_id
         )
-    return saved_product
+        if not saved_product:
+            raise HTTPException(
+                detail="Product with this id not found",
+                status_code=status.HTTP_404_NOT_FOUND,
+            )
+        return saved_product
+
+    return await response_cache.get_or_set(
+        namespace=Product.__tablename__,
+        key=f"id:{product_id}",
+        loader=load_product,
+        schema=SavedProductSchema,
+        request=request,
+    )
 
 
-@router_products.get("/")
+@router_products.get("/", response_model=PaginatorSavedProductResponseSchema)
 async def get_products(
     params: Annotated[SearchParamsSchema, Depends()],
+    request: Request,
     session: AsyncSession = Depends(get_async_session),
-) -> PaginatorSavedProductResponseSchema:
-    result = await product_manager.get_items_paginated(
-        session=session,
-        params=params,
-        targeted_schema=SavedProductSchema,
-        search_fields=[Product.title, Product.description],
+) -> Response:
+    async def load_products() -> PaginationResponseSchema:
+        return await product_manager.get_items_paginated(
+            session=session,
+            params=params,
+            targeted_schema=SavedProductSchema,
+            search_fields=[Product.title, Product.description],
+            projection=True,
+        )
+
+    return await response_cache.get_or_set(
+        namespace=Product.__tablename__,
+        key=f"list:{response_cache.get_params_key(params)}",
+        loader=load_products,
+        request=request,
     )
-    return result
+
+
+@router_products.patch(
+    "/batch",
+    status_code=status.HTTP_200_OK,
+    dependencies=[
+        Depends(require_permissions([UserPermissionsEnum.CAN_CREATE_PRODUCT]))
+    ],
+)
+async def batch_update_products(
+    items: list[BatchPatchProductItemSchema] = Body(min_length=1, max_length=1000),
+    session: AsyncSession = Depends(get_async_session),
+) -> list[BatchPatchResultSchema]:
+    """Update many products in one transaction, reporting conflicts per item"""
+    results = await product_manager.patch_many(session=session, items=items)
+    await response_cache.invalidate(Product.__tablename__)
+    return results
 
 
 @router_products.patch(
@@ -255,6 +404,7 @@ async def update_product(
     updated_product = await product_manager.patch(
         session=session, instance_id=product_id, data_to_patch=patch_data
     )
+    await response_cache.invalidate(Product.__tablename__)
     return updated_product
 
 
@@ -270,40 +420,60 @@ async def delete_product(
     session: AsyncSession = Depends(get_async_session),
 ):
     await product_manager.delete_item(session=session, instance_id=product_id)
+    await response_cache.invalidate(Product.__tablename__)
 
 
 @router_orders.get("/")
 async def get_current_order(
-    order: Order = Depends(get_order),
+    user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
 ) -> OrderSchema:
+    if settings.CART_REDIS_ENABLED:
+        return await cart_store.get_order(user_id=user.id, session=session)
+
+    order = await get_order(user=user, session=session)
     order = await order_manager.get_order_with_products(order=order, session=None)
     return OrderSchema.model_validate(order)
 
 
 @router_orders.patch("/change-order-product-quantity")
 async def change_order_product_quantity(
-    order: Order = Depends(get_order),
+    user: User = Depends(get_current_user),
     quantity: int = Body(ge=0, default=1),
     mode: ModeChangeOrderProductQuantityEnum = Body(
         default=ModeChangeOrderProductQuantityEnum.INCREASE
     ),
-    product: Product = Depends(get_product),
+    product_id: int = Body(ge=1),
     session: AsyncSession = Depends(get_async_session),
 ) -> OrderSchema:
-    if (
-        mode == ModeChangeOrderProductQuantityEnum.DECREASE
-        and mode != ModeChangeOrderProductQuantityEnum.SET
-    ):
+    if mode == ModeChangeOrderProductQuantityEnum.DECREASE:
         quantity = -quantity
-
     is_set_quantity_mode = mode == ModeChangeOrderProductQuantityEnum.SET
-    await order_product_manager.change_quantity_and_set_current_price(
+
+    if settings.CART_REDIS_ENABLED:
+        product = await get_product(product_id=product_id, session=session)
+        await cart_store.change_quantity(
+            session=session,
+            user_id=user.id,
+            product=product,
+            quantity=quantity,
+            is_set_quantity_mode=is_set_quantity_mode,
+        )
+        return await cart_store.get_order(user_id=user.id, session=session)
+
+    order = await get_order_without_products(user=user, session=session)
+    is_changed = await order_product_manager.change_quantity_and_set_current_price(
         session=session,
         order=order,
-        product=product,
+        product_id=product_id,
         quantity=quantity,
         is_set_quantity_mode=is_set_quantity_mode,
     )
+    if not is_changed:
+        raise HTTPException(
+            detail="Product with this id not found",
+            status_code=status.HTTP_404_NOT_FOUND,
+        )
     updated_order = await order_manager.get_order_with_products(
         order=order.id, session=session
     )
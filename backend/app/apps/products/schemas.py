@@ -1,8 +1,9 @@
 from datetime import datetime
+from decimal import Decimal
 from enum import StrEnum
 
 from apps.core.schemas import IdSchema, InstanceVersion, PaginationResponseSchema
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
 
 
 class NewCategory(BaseModel):
@@ -27,10 +28,14 @@ class PatchCategorySchema(InstanceVersion, NewCategory):
     pass
 
 
+class BatchPatchCategoryItemSchema(IdSchema, InstanceVersion):
+    changes: NewCategory
+
+
 class SavedProductSchema(IdSchema):
     title: str
     description: str
-    price: float
+    price: Decimal
     category_id: int
     main_image: str
     images: list[str]
@@ -40,13 +45,98 @@ class SavedProductSchema(IdSchema):
 
 
 class PaginatorSavedProductResponseSchema(PaginationResponseSchema):
-    items: list[SavedCategorySchema]
+    items: list[SavedProductSchema]
+
+
+class PatchProductSchema(BaseModel):
+    title: str | None = Field(default=None, min_length=3, max_length=70)
+    description: str | None = Field(default=None, min_length=3, max_length=2048)
+    price: Decimal | None = Field(
+        default=None, ge=Decimal("0.01"), max_digits=12, decimal_places=2
+    )
+    category_id: int | None = Field(default=None, gt=0)
+    main_image: str | None = Field(default=None, min_length=1)
+    images: list[str] | None = Field(default=None, max_length=10)
+
+    model_config = ConfigDict(str_strip_whitespace=True, extra="forbid")
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def reject_null(cls, value):
+        # the columns are not nullable, a field is either changed or left out
+        if value is None:
+            raise ValueError("Field can not be null")
+        return value
+
+
+class BatchPatchProductItemSchema(IdSchema):
+    changes: PatchProductSchema
+
+
+class ImportFormatEnum(StrEnum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+class ImportProductSchema(BaseModel):
+    title: str = Field(min_length=3, max_length=70)
+    description: str = Field(min_length=3, max_length=2048)
+    price: Decimal = Field(ge=Decimal("0.01"), max_digits=12, decimal_places=2)
+    category_id: int | None = Field(default=None, gt=0)
+    category_name: str | None = Field(default=None, min_length=3, max_length=50)
+    main_image: str = Field(min_length=1)
+    images: list[str] = Field(default_factory=list, max_length=10)
+
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+    @field_validator("category_id", "category_name", mode="before")
+    @classmethod
+    def empty_to_none(cls, value):
+        return value or None
+
+    @field_validator("images", mode="before")
+    @classmethod
+    def split_images(cls, value):
+        # csv cells hold the image urls separated with "|"
+        if isinstance(value, str):
+            return [image for image in value.split("|") if image]
+        return value
+
+    @field_validator("title", "description", "category_name", "main_image", "images")
+    @classmethod
+    def reject_nul(cls, value):
+        # postgres text can not hold NUL characters, copying them fails
+        values = value if isinstance(value, list) else [value]
+        if any("\x00" in item for item in values if item):
+            raise ValueError("NUL characters are not allowed")
+        return value
+
+    @model_validator(mode="after")
+    def check_category(self):
+        if self.category_id is None and self.category_name is None:
+            raise ValueError("category_id or category_name is required")
+        return self
+
+
+class ProductImportErrorSchema(BaseModel):
+    row: int
+    detail: str
+
+
+class ProductImportResultSchema(BaseModel):
+    processed: int
+    inserted: int
+    updated: int
+    failed: int
+    errors: list[ProductImportErrorSchema]
+    duration_seconds: float
+    rows_per_second: float
 
 
 class OrderProductsSchema(BaseModel):
-    price: float
+    price: Decimal
     quantity: int
-    total: float
+    total: Decimal
     product: SavedProductSchema
 
     class Config:
@@ -57,7 +147,7 @@ class OrderSchema(BaseModel):
     created_at: datetime = Field(examples=[datetime.now()])
     is_closed: bool = Field(examples=[False])
     user_id: int
-    cost: float
+    cost: Decimal
     products: list[OrderProductsSchema]
 
     class Config:
@@ -1,10 +1,12 @@
+from apps.auth.password_handler import PasswordEncrypt
+from apps.auth.user_cache import user_cache
+from apps.core.base_crud import BaseCRUDManager
 from fastapi import HTTPException, status
+from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from apps.core.base_crud import BaseCRUDManager
 from .models import User
 from .schemas import RegisterUserSchema
-from apps.auth.password_handler import PasswordEncrypt
 
 
 class UserCRUDManager(BaseCRUDManager):
@@ -25,5 +27,25 @@ class UserCRUDManager(BaseCRUDManager):
         )
         return user
 
+    async def patch(
+        self,
+        instance_id: int,
+        session: AsyncSession,
+        data_to_patch: BaseModel,
+        exclude_unset: bool = True,
+    ) -> User:
+        user = await super().patch(
+            instance_id=instance_id,
+            session=session,
+            data_to_patch=data_to_patch,
+            exclude_unset=exclude_unset,
+        )
+        await user_cache.invalidate(instance_id)
+        return user
+
+    async def delete_item(self, instance_id: int, session: AsyncSession) -> None:
+        await super().delete_item(instance_id=instance_id, session=session)
+        await user_cache.invalidate(instance_id)
+
 
 user_manager = UserCRUDManager()
@@ -0,0 +1,111 @@
+"""Latency of /products/ while /auth/login is being hammered.
+
+Runs against a live server: first /products/ alone, then the same probe
+while ``--login-concurrency`` clients log in back to back. A blocked event
+loop shows up as the gap between the two p99 values.
+
+    python scripts/bench_login_storm.py --base-url http://localhost:8000 \
+        --email user@example.com --password secret
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+
+import httpx
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(round(pct / 100 * (len(ordered) - 1)), len(ordered) - 1)
+    return ordered[index]
+
+
+def report(name: str, latencies: list[float]) -> None:
+    if not latencies:
+        print(f"{name}: no requests")
+        return
+    ms = [latency * 1000 for latency in latencies]
+    print(
+        f"{name}: n={len(ms)} "
+        f"p50={statistics.median(ms):.1f}ms "
+        f"p95={percentile(ms, 95):.1f}ms "
+        f"p99={percentile(ms, 99):.1f}ms "
+        f"max={max(ms):.1f}ms"
+    )
+
+
+async def probe(
+    client: httpx.AsyncClient, stop_at: float, interval: float
+) -> list[float]:
+    latencies = []
+    while time.monotonic() < stop_at:
+        started_at = time.perf_counter()
+        response = await client.get("/api/products/")
+        latencies.append(time.perf_counter() - started_at)
+        response.raise_for_status()
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def login(
+    client: httpx.AsyncClient,
+    stop_at: float,
+    email: str,
+    password: str,
+    statuses: Counter,
+) -> list[float]:
+    latencies = []
+    while time.monotonic() < stop_at:
+        started_at = time.perf_counter()
+        response = await client.post(
+            "/api/auth/login", data={"username": email, "password": password}
+        )
+        latencies.append(time.perf_counter() - started_at)
+        statuses[response.status_code] += 1
+    return latencies
+
+
+async def main(args: argparse.Namespace) -> None:
+    limits = httpx.Limits(max_connections=args.login_concurrency + 10)
+    async with httpx.AsyncClient(
+        base_url=args.base_url, limits=limits, timeout=60
+    ) as client:
+        # warm up connections and caches
+        await client.get("/api/products/")
+
+        stop_at = time.monotonic() + args.duration
+        report("products, idle", await probe(client, stop_at, args.interval))
+
+        statuses: Counter = Counter()
+        stop_at = time.monotonic() + args.duration
+        probe_task = asyncio.create_task(probe(client, stop_at, args.interval))
+        login_tasks = [
+            asyncio.create_task(
+                login(client, stop_at, args.email, args.password, statuses)
+            )
+            for _ in range(args.login_concurrency)
+        ]
+        report("products, during login storm", await probe_task)
+        login_latencies = [
+            latency
+            for latencies in await asyncio.gather(*login_tasks)
+            for latency in latencies
+        ]
+        report("login", login_latencies)
+        print("login statuses:", dict(statuses))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--login-concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument(
+        "--interval", type=float, default=0.05, help="pause between probes"
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,146 @@
+import asyncio
+from abc import ABC, abstractmethod
+from uuid import uuid4
+
+import stripe
+from fastapi import HTTPException, status
+from settings import settings
+
+
+class PaymentProvider(ABC):
+    def __init__(self):
+        self.semaphore = asyncio.Semaphore(settings.PAYMENT_MAX_CONCURRENCY)
+        self.in_flight: int = 0
+
+    async def create_checkout_url(
+        self,
+        *,
+        line_items: list[dict],
+        success_url: str,
+        cancel_url: str,
+        customer_email: str,
+        metadata: dict,
+    ) -> str:
+        if self.in_flight - settings.PAYMENT_MAX_CONCURRENCY >= (
+            settings.PAYMENT_MAX_QUEUE
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many payment requests, try again later",
+            )
+        self.in_flight += 1
+        try:
+            async with self.semaphore:
+                async with asyncio.timeout(settings.PAYMENT_TIMEOUT_SECONDS):
+                    return await self._create_checkout_url(
+                        line_items=line_items,
+                        success_url=success_url,
+                        cancel_url=cancel_url,
+                        customer_email=customer_email,
+                        metadata=metadata,
+                    )
+        except (TimeoutError, stripe.APIConnectionError):
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="Payment provider is not responding, try again later",
+            )
+        finally:
+            self.in_flight -= 1
+
+    def get_stats(self) -> dict:
+        return {
+            "provider": settings.PAYMENT_PROVIDER,
+            "in_flight": self.in_flight,
+            "max_concurrency": settings.PAYMENT_MAX_CONCURRENCY,
+            "max_queue": settings.PAYMENT_MAX_QUEUE,
+        }
+
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    async def _create_checkout_url(
+        self,
+        *,
+        line_items: list[dict],
+        success_url: str,
+        cancel_url: str,
+        customer_email: str,
+        metadata: dict,
+    ) -> str:
+        pass
+
+
+class StripePaymentProvider(PaymentProvider):
+    """Stripe through its async client, sharing one keep-alive httpx client"""
+
+    def __init__(self):
+        super().__init__()
+        self.http_client = stripe.HTTPXClient(timeout=settings.PAYMENT_TIMEOUT_SECONDS)
+        self.client = stripe.StripeClient(
+            settings.STRIPE_SECRET_KEY,
+            http_client=self.http_client,
+            max_network_retries=settings.PAYMENT_MAX_NETWORK_RETRIES,
+        )
+
+    async def _create_checkout_url(
+        self,
+        *,
+        line_items: list[dict],
+        success_url: str,
+        cancel_url: str,
+        customer_email: str,
+        metadata: dict,
+    ) -> str:
+        checkout_session = await self.client.v1.checkout.sessions.create_async(
+            params={
+                "line_items": line_items,
+                "mode": "payment",
+                "success_url": success_url,
+                "cancel_url": cancel_url,
+                "customer_email": customer_email,
+                "metadata": metadata,
+            }
+        )
+        return checkout_session.url
+
+    async def close(self) -> None:
+        await self.http_client.close_async()
+
+
+class FakePaymentProvider(PaymentProvider):
+    """Local provider for development and tests, nothing leaves the process"""
+
+    def __init__(self):
+        super().__init__()
+        self.checkout_sessions: dict[str, dict] = {}
+
+    async def _create_checkout_url(
+        self,
+        *,
+        line_items: list[dict],
+        success_url: str,
+        cancel_url: str,
+        customer_email: str,
+        metadata: dict,
+    ) -> str:
+        session_id = f"cs_fake_{uuid4().hex}"
+        self.checkout_sessions[session_id] = {
+            "line_items": line_items,
+            "customer_email": customer_email,
+            "metadata": metadata,
+            "amount_total": sum(
+                item["price_data"]["unit_amount"] * item["quantity"]
+                for item in line_items
+            ),
+        }
+        return f"{success_url}?checkout_session_id={session_id}"
+
+
+def get_payment_provider() -> PaymentProvider:
+    if settings.PAYMENT_PROVIDER == "fake":
+        return FakePaymentProvider()
+    return StripePaymentProvider()
+
+
+payment_provider = get_payment_provider()
@@ -1,9 +1,158 @@
+import asyncio
 import datetime as dt
+from collections import OrderedDict
 from contextlib import asynccontextmanager
 
 import redis.asyncio as redis
 from settings import settings
 
+_MISSING = object()
+
+
+class RedisNearCache:
+    """Bounded in-process copy of hot keys, built on Redis client side caching.
+
+    One connection enables CLIENT TRACKING in broadcast mode for the
+    configured prefixes and redirects invalidations to a second connection
+    subscribed to __redis__:invalidate, so a write to a tracked key from any
+    client evicts it here. While tracking is down nothing is cached.
+    """
+
+    invalidation_channel = b"__redis__:invalidate"
+    retry_interval = 5
+
+    def __init__(self, redis_client: redis.Redis, max_size: int, prefixes: list[str]):
+        self.redis = redis_client
+        self.max_size = max_size
+        self.prefixes = tuple(prefixes)
+        self.values: OrderedDict[str, bytes | None] = OrderedDict()
+        self.is_active = False
+        self.epoch = 0
+        self.pending_reads: dict[str, int] = {}
+        self.key_versions: dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._listener_task: asyncio.Task | None = None
+
+    def tracks(self, key: str) -> bool:
+        return self.is_active and key.startswith(self.prefixes)
+
+    def lookup(self, key: str):
+        value = self.values.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return _MISSING
+        self.hits += 1
+        self.values.move_to_end(key)
+        return value
+
+    def begin_read(self, key: str) -> tuple[int, int]:
+        self.pending_reads[key] = self.pending_reads.get(key, 0) + 1
+        return self.epoch, self.key_versions.get(key, 0)
+
+    def end_read(self, key: str, read: tuple[int, int], value=_MISSING) -> None:
+        # an invalidation of this key that arrived while it was being read
+        # means the value can already be stale
+        is_current = read == (self.epoch, self.key_versions.get(key, 0))
+        pending_reads = self.pending_reads.pop(key) - 1
+        if pending_reads:
+            self.pending_reads[key] = pending_reads
+        else:
+            self.key_versions.pop(key, None)
+        if value is _MISSING or not is_current or not self.is_active:
+            return
+        self.values[key] = value
+        self.values.move_to_end(key)
+        while len(self.values) > self.max_size:
+            self.values.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        if not key.startswith(self.prefixes):
+            return
+        # versions are kept only for keys with reads in flight
+        if key in self.pending_reads:
+            self.key_versions[key] = self.key_versions.get(key, 0) + 1
+        if self.values.pop(key, _MISSING) is not _MISSING:
+            self.invalidations += 1
+
+    def flush(self) -> None:
+        self.epoch += 1
+        self.invalidations += len(self.values)
+        self.values.clear()
+
+    def get_stats(self) -> dict:
+        return {
+            "is_active": self.is_active,
+            "size": len(self.values),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+    async def start(self) -> None:
+        if self._listener_task is None:
+            self._listener_task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._listener_task is None:
+            return
+        self._listener_task.cancel()
+        try:
+            await self._listener_task
+        except asyncio.CancelledError:
+            pass
+        self._listener_task = None
+
+    async def _run(self) -> None:
+        while True:
+            pool = self.redis.connection_pool
+            listener = pool.connection_class(**pool.connection_kwargs)
+            tracker = pool.connection_class(**pool.connection_kwargs)
+            try:
+                await self._track(listener=listener, tracker=tracker)
+            except (redis.RedisError, OSError):
+                pass
+            finally:
+                self.is_active = False
+                self.flush()
+                await listener.disconnect()
+                await tracker.disconnect()
+            await asyncio.sleep(self.retry_interval)
+
+    async def _track(self, listener, tracker) -> None:
+        await listener.connect()
+        await listener.send_command("CLIENT", "ID")
+        listener_id = await listener.read_response()
+        await listener.send_command("SUBSCRIBE", self.invalidation_channel)
+        await listener.read_response()
+
+        await tracker.connect()
+        prefix_args = [arg for prefix in self.prefixes for arg in ("PREFIX", prefix)]
+        await tracker.send_command(
+            "CLIENT", "TRACKING", "ON", "REDIRECT", listener_id, "BCAST", *prefix_args
+        )
+        await tracker.read_response()
+        self.is_active = True
+
+        while True:
+            message = await listener.read_response(
+                timeout=settings.REDIS_HEALTH_CHECK_INTERVAL
+            )
+            if message is None:
+                # tracking dies silently with its connection, keep it checked
+                await tracker.send_command("PING")
+                await tracker.read_response()
+                continue
+            message_type, channel, keys = message
+            if message_type != b"message" or channel != self.invalidation_channel:
+                continue
+            if keys is None:
+                self.flush()
+                continue
+            for key in keys:
+                self.invalidate(key.decode())
+
 
 class RedisService:
     def __init__(self):
@@ -14,6 +163,16 @@ class RedisService:
             password=settings.REDIS_PASSWORD,
             db=settings.REDIS_DATABASE,
             decode_responses=False,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_keepalive=settings.REDIS_SOCKET_KEEPALIVE,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+        )
+        self.near_cache = RedisNearCache(
+            redis_client=self.redis,
+            max_size=settings.REDIS_NEAR_CACHE_SIZE,
+            prefixes=settings.REDIS_NEAR_CACHE_PREFIXES,
         )
 
     @asynccontextmanager
@@ -26,17 +185,74 @@ class RedisService:
             pass
             # await self.redis.close()
 
-    async def set_cache(self, key: str, value: str | int, ttl: int = 60):
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = False):
+        async with self.redis.pipeline(transaction=transaction) as pipe:
+            yield pipe
+
+    async def set_cache(
+        self, key: str, value: str | int | bytes, ttl: int | dt.timedelta = 60
+    ):
+        if not isinstance(ttl, dt.timedelta):
+            ttl = dt.timedelta(minutes=ttl)
+        self.near_cache.invalidate(key)
         async with self.get_redis() as _redis:
-            await _redis.setex(key, dt.timedelta(minutes=ttl), value)
+            await _redis.setex(key, ttl, value)
 
     async def get_cache(self, key: str):
-        async with self.get_redis() as _redis:
-            return await _redis.get(key)
+        if not self.near_cache.tracks(key):
+            async with self.get_redis() as _redis:
+                return await _redis.get(key)
+
+        value = self.near_cache.lookup(key)
+        if value is not _MISSING:
+            return value
+        read = self.near_cache.begin_read(key)
+        try:
+            async with self.get_redis() as _redis:
+                value = await _redis.get(key)
+        except Exception:
+            self.near_cache.end_read(key, read)
+            raise
+        self.near_cache.end_read(key, read, value)
+        return value
 
     async def delete_cache(self, key: str):
+        self.near_cache.invalidate(key)
         async with self.get_redis() as _redis:
             await _redis.delete(key)
 
+    async def increment(self, key: str) -> int:
+        self.near_cache.invalidate(key)
+        async with self.get_redis() as _redis:
+            return await _redis.incr(key)
+
+    async def mget_cache(self, keys: list[str]) -> list:
+        if not keys:
+            return []
+        async with self.get_redis() as _redis:
+            return await _redis.mget(keys)
+
+    async def mset_cache(
+        self, values: dict[str, str | int], ttl: int | dict[str, int] = 60
+    ):
+        if not values:
+            return
+        for key in values:
+            self.near_cache.invalidate(key)
+        async with self.pipeline() as pipe:
+            for key, value in values.items():
+                key_ttl = ttl[key] if isinstance(ttl, dict) else ttl
+                pipe.setex(key, dt.timedelta(minutes=key_ttl), value)
+            await pipe.execute()
+
+    async def delete_many(self, keys: list[str]):
+        if not keys:
+            return
+        for key in keys:
+            self.near_cache.invalidate(key)
+        async with self.get_redis() as _redis:
+            await _redis.delete(*keys)
+
 
 redis_service = RedisService()
@@ -0,0 +1,242 @@
+import asyncio
+import datetime as dt
+import hashlib
+import math
+import random
+import time
+from functools import wraps
+from typing import Any, Awaitable, Callable, NamedTuple
+
+import orjson
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from services.redis_service import redis_service
+from settings import settings
+
+
+class TaggedResult(NamedTuple):
+    etag: str
+    result: Any
+
+
+class ResponseCache:
+    """Serialized response bytes cached in Redis under versioned namespaces.
+
+    Every key embeds the current version of its namespace, so bumping the
+    version after a write makes all cached responses of that namespace
+    unreachable at once; they then expire on their own.
+
+    Entries stay in Redis for a stale window after they expire. Only the
+    caller holding the Redis lock recomputes, everyone else gets the stale
+    bytes meanwhile. Entries may also be recomputed a little before expiry,
+    with a probability that grows as expiry nears and with the time the last
+    computation took, which spreads recomputations out.
+
+    Each entry carries a strong ETag, built from ``id``/``updated_at``/
+    ``version`` of the cached instance or from the bytes themselves, so a
+    matching ``If-None-Match`` is answered with an empty 304.
+    """
+
+    def __init__(self):
+        self.ttl = settings.RESPONSE_CACHE_TTL_MINUTES * 60
+        self.stale_ttl = settings.RESPONSE_CACHE_STALE_SECONDS
+        self.lock_ttl = settings.RESPONSE_CACHE_LOCK_SECONDS
+        self.beta = settings.RESPONSE_CACHE_EARLY_EXPIRATION_BETA
+        self._in_flight: dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def get_version_key(namespace: str) -> str:
+        return f"cache-version:{namespace}"
+
+    @staticmethod
+    def get_params_key(params: BaseModel) -> str:
+        return hashlib.sha1(params.model_dump_json().encode()).hexdigest()
+
+    @staticmethod
+    def build_etag(*parts: Any) -> str:
+        return f'"{hashlib.sha1(":".join(map(str, parts)).encode()).hexdigest()}"'
+
+    async def build_key(self, namespace: str, key: str) -> str:
+        version = await redis_service.get_cache(self.get_version_key(namespace))
+        return f"response-cache:{namespace}:v{int(version or 0)}:{key}"
+
+    async def get_or_set(
+        self,
+        namespace: str,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int | None = None,
+        schema: type[BaseModel] | None = None,
+        request: Request | None = None,
+    ) -> Response:
+        """Return cached bytes for the key, loading them on a miss.
+
+        With ``schema`` the loader returns an ORM instance, which is validated
+        by the schema and also used to build the ETag.
+        """
+        ttl = ttl or self.ttl
+        cache_key = await self.build_key(namespace=namespace, key=key)
+        if schema is not None:
+            loader = self._with_schema(namespace, loader, schema)
+        entry = await redis_service.get_cache(cache_key)
+        if entry is not None:
+            expires_at, compute_time, etag, content = self._unpack(entry)
+            if not self._should_recompute(expires_at, compute_time):
+                return self._to_response(etag, content, request)
+            lock = self._get_lock(cache_key)
+            if not await lock.acquire(blocking=False):
+                return self._to_response(etag, content, request)
+            try:
+                etag, content = await self._single_flight(cache_key, loader, ttl)
+            finally:
+                await self._release(lock)
+            return self._to_response(etag, content, request)
+
+        etag, content = await self._single_flight(
+            cache_key, lambda: self._load_locked(cache_key, loader, ttl), ttl=None
+        )
+        return self._to_response(etag, content, request)
+
+    async def invalidate(self, namespace: str) -> None:
+        await redis_service.increment(self.get_version_key(namespace))
+
+    def cached(self, namespace: str, ttl: int | None = None) -> Callable:
+        """Cache a GET endpoint, keyed by its (hashable) query arguments"""
+
+        def decorator(func: Callable[..., Awaitable[Any]]) -> Callable:
+            @wraps(func)
+            async def wrapper(*args: Any, **kwargs: Any) -> Response:
+                key = hashlib.sha1(
+                    orjson.dumps(jsonable_encoder(kwargs), option=orjson.OPT_SORT_KEYS)
+                ).hexdigest()
+                return await self.get_or_set(
+                    namespace=namespace,
+                    key=f"{func.__module__}.{func.__name__}:{key}",
+                    loader=lambda: func(*args, **kwargs),
+                    ttl=ttl,
+                )
+
+            return wrapper
+
+        return decorator
+
+    def _with_schema(
+        self,
+        namespace: str,
+        loader: Callable[[], Awaitable[Any]],
+        schema: type[BaseModel],
+    ) -> Callable[[], Awaitable[TaggedResult]]:
+        async def load() -> TaggedResult:
+            instance = await loader()
+            etag = self.build_etag(
+                namespace,
+                instance.id,
+                instance.updated_at.isoformat(),
+                getattr(instance, "version", None),
+            )
+            return TaggedResult(etag=etag, result=schema.model_validate(instance))
+
+        return load
+
+    async def _single_flight(
+        self, cache_key: str, loader: Callable[[], Awaitable[Any]], ttl: int | None
+    ) -> tuple[str, bytes]:
+        # concurrent misses of one key inside this worker share one computation
+        in_flight = self._in_flight.get(cache_key)
+        if in_flight is not None:
+            return await asyncio.shield(in_flight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[cache_key] = future
+        try:
+            content = await (self._store(cache_key, loader, ttl) if ttl else loader())
+            future.set_result(content)
+            return content
+        except BaseException as exc:
+            future.set_exception(exc)
+            # mark as retrieved, there may be no one else waiting for it
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[cache_key]
+
+    async def _load_locked(
+        self, cache_key: str, loader: Callable[[], Awaitable[Any]], ttl: int
+    ) -> tuple[str, bytes]:
+        lock = self._get_lock(cache_key)
+        if await lock.acquire(blocking=False):
+            try:
+                return await self._store(cache_key, loader, ttl)
+            finally:
+                await self._release(lock)
+
+        # another worker computes it, wait for its result up to the lock ttl
+        deadline = time.monotonic() + self.lock_ttl
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            entry = await redis_service.get_cache(cache_key)
+            if entry is not None:
+                return self._unpack(entry)[2:]
+        return await self._store(cache_key, loader, ttl)
+
+    async def _store(
+        self, cache_key: str, loader: Callable[[], Awaitable[Any]], ttl: int
+    ) -> tuple[str, bytes]:
+        started_at = time.time()
+        result = await loader()
+        etag = None
+        if isinstance(result, TaggedResult):
+            etag, result = result
+        content = orjson.dumps(jsonable_encoder(result))
+        etag = etag or self.build_etag(hashlib.sha1(content).hexdigest())
+        compute_time = time.time() - started_at
+        entry = f"{started_at + ttl}:{compute_time}:{etag}:".encode() + content
+        await redis_service.set_cache(
+            key=cache_key,
+            value=entry,
+            ttl=dt.timedelta(seconds=ttl + self.stale_ttl),
+        )
+        return etag, content
+
+    def _should_recompute(self, expires_at: float, compute_time: float) -> bool:
+        early_by = -compute_time * self.beta * math.log(1 - random.random())
+        return time.time() + early_by >= expires_at
+
+    def _get_lock(self, cache_key: str):
+        return redis_service.redis.lock(
+            f"lock:{cache_key}", timeout=self.lock_ttl, thread_local=False
+        )
+
+    @staticmethod
+    async def _release(lock) -> None:
+        try:
+            await lock.release()
+        except Exception:  # noqa: BLE001
+            # the lock timed out and may belong to someone else by now
+            pass
+
+    @staticmethod
+    def _unpack(entry: bytes) -> tuple[float, float, str, bytes]:
+        expires_at, compute_time, etag, content = entry.split(b":", 3)
+        return float(expires_at), float(compute_time), etag.decode(), content
+
+    @staticmethod
+    def _to_response(
+        etag: str, content: bytes, request: Request | None = None
+    ) -> Response:
+        headers = {"ETag": etag}
+        if request is not None:
+            if_none_match = request.headers.get("if-none-match", "")
+            candidates = {
+                candidate.strip().removeprefix("W/")
+                for candidate in if_none_match.split(",")
+            }
+            if etag in candidates or "*" in candidates:
+                return Response(
+                    status_code=status.HTTP_304_NOT_MODIFIED, headers=headers
+                )
+        return Response(content=content, media_type="application/json", headers=headers)
+
+
+response_cache = ResponseCache()
@@ -1,4 +1,5 @@
 from functools import lru_cache
+from typing import Literal
 
 from pydantic_settings import BaseSettings
 
@@ -25,6 +26,30 @@ class JWTSettings(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_TIME_MINUTES: int = 5
     REFRESH_TOKEN_TIME_MINUTES: int = 60
+    # asymmetric algorithms (RS256, EdDSA, ...) sign with the private key
+    # and verify with the JWKS, so other services only need the JWKS
+    JWT_PRIVATE_KEY_PATH: str | None = None
+    JWT_JWKS_PATH: str | None = None
+    JWT_KEY_ID: str | None = None
+    JWT_DECODED_CACHE_SIZE: int = 10000
+
+
+class PasswordHashSettings(BaseSettings):
+    # the first scheme hashes new passwords, the rest are only verified
+    PASSWORD_HASH_SCHEMES: list[str] = ["bcrypt"]
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_ARGON2_TIME_COST: int = 3
+    PASSWORD_ARGON2_MEMORY_COST: int = 65536
+    PASSWORD_ARGON2_PARALLELISM: int = 4
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_CONCURRENCY: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 100
+
+
+class AuthCacheSettings(BaseSettings):
+    AUTH_USER_CACHE_TTL_MINUTES: int = 5
+    AUTH_USER_CACHE_LOCAL_TTL_SECONDS: int = 5
+    AUTH_USER_CACHE_LOCAL_SIZE: int = 1024
 
 
 class RedisSettings(BaseSettings):
@@ -33,6 +58,35 @@ class RedisSettings(BaseSettings):
     REDIS_USERNAME: str
     REDIS_PASSWORD: str
     REDIS_DATABASE: int = 0
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_SOCKET_TIMEOUT: float = 5
+    REDIS_SOCKET_KEEPALIVE: bool = True
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+    REDIS_NEAR_CACHE_ENABLED: bool = False
+    REDIS_NEAR_CACHE_SIZE: int = 10000
+    REDIS_NEAR_CACHE_PREFIXES: list[str] = ["auth-user:", "cache-version:"]
+
+
+class ResponseCacheSettings(BaseSettings):
+    RESPONSE_CACHE_TTL_MINUTES: int = 10
+    RESPONSE_CACHE_STALE_SECONDS: int = 60
+    RESPONSE_CACHE_LOCK_SECONDS: int = 10
+    RESPONSE_CACHE_EARLY_EXPIRATION_BETA: float = 1.0
+
+
+class CartSettings(BaseSettings):
+    # open carts live in redis and are written behind to postgres
+    CART_REDIS_ENABLED: bool = False
+    # persist every change right away instead of on the next flush
+    CART_WRITE_THROUGH: bool = False
+    CART_FLUSH_INTERVAL_SECONDS: float = 5
+    CART_FLUSH_BATCH_SIZE: int = 100
+    CART_TTL_HOURS: int = 24 * 7
+
+
+class ProductImportSettings(BaseSettings):
+    PRODUCT_IMPORT_BATCH_SIZE: int = 1000
+    PRODUCT_IMPORT_MAX_REPORTED_ERRORS: int = 1000
 
 
 class S3Settings(BaseSettings):
@@ -46,13 +100,34 @@ class S3Settings(BaseSettings):
 
 class PaymentSettings(BaseSettings):
     STRIPE_SECRET_KEY: str
+    # "fake" keeps checkout local, for development and tests
+    PAYMENT_PROVIDER: Literal["stripe", "fake"] = "stripe"
+    PAYMENT_TIMEOUT_SECONDS: float = 10
+    PAYMENT_MAX_NETWORK_RETRIES: int = 2
+    PAYMENT_MAX_CONCURRENCY: int = 20
+    PAYMENT_MAX_QUEUE: int = 100
+    STRIPE_WEBHOOK_SECRET: str
+    # webhook events are processed by a worker, not inside the request;
+    # run it with "python -m apps.payments.events" (the payment-worker of the
+    # helm chart and compose files), or enable it to run inside the api process
+    PAYMENT_EVENT_WORKER_ENABLED: bool = False
+    PAYMENT_EVENT_DEDUPE_TTL_HOURS: int = 24 * 7
+    PAYMENT_EVENT_MAX_ATTEMPTS: int = 8
+    PAYMENT_EVENT_RETRY_BASE_SECONDS: int = 5
+    PAYMENT_EVENT_CLAIM_IDLE_SECONDS: int = 5 * 60
+    PAYMENT_EVENT_BATCH_SIZE: int = 10
 
 
 class Settings(
     CoreSettings,
     PostgresSettings,
     JWTSettings,
+    PasswordHashSettings,
+    AuthCacheSettings,
     RedisSettings,
+    ResponseCacheSettings,
+    ProductImportSettings,
+    CartSettings,
     S3Settings,
     PaymentSettings,
 ):
@@ -0,0 +1,111 @@
+"""Tests run against the configured Postgres and Redis, with the schema
+migrated (``alembic upgrade head``). Every test works inside a transaction
+which is rolled back afterwards. Without a database they are skipped, but
+fail on CI.
+"""
+
+import os
+from decimal import Decimal
+from typing import AsyncIterator
+from uuid import uuid4
+
+import pytest
+from apps.auth.dependencies import get_current_user
+from apps.core.base_models import engine
+from apps.core.dependencies import get_async_session
+from apps.products.models import Category, Order, OrderProduct, Product
+from apps.users.models import User
+from httpx import ASGITransport, AsyncClient
+from main import app
+from services.redis_service import redis_service
+from services.response_cache import response_cache
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture
+async def session() -> AsyncIterator[AsyncSession]:
+    try:
+        connection = await engine.connect()
+    except OSError as e:
+        if os.environ.get("CI"):
+            raise
+        pytest.skip(f"Database is not available: {e}")
+    transaction = await connection.begin()
+    # commits inside the app release savepoints, not the outer transaction
+    async with AsyncSession(
+        bind=connection,
+        expire_on_commit=False,
+        join_transaction_mode="create_savepoint",
+    ) as session:
+        yield session
+    await transaction.rollback()
+    await connection.close()
+    # pooled connections are bound to the event loop of the test
+    await engine.dispose()
+    await redis_service.redis.connection_pool.disconnect()
+
+
+@pytest.fixture
+async def client(session: AsyncSession) -> AsyncIterator[AsyncClient]:
+    async def get_test_session() -> AsyncIterator[AsyncSession]:
+        yield session
+
+    app.dependency_overrides[get_async_session] = get_test_session
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        yield client
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+async def user(session: AsyncSession) -> User:
+    user = User(name="Buyer", email=f"{uuid4().hex}@example.com", hashed_password="-")
+    session.add(user)
+    await session.flush()
+    app.dependency_overrides[get_current_user] = lambda: user
+    return user
+
+
+@pytest.fixture
+async def products(session: AsyncSession) -> list[Product]:
+    category = Category(name=f"Category {uuid4().hex[:12]}")
+    session.add(category)
+    await session.flush()
+    products = [
+        Product(
+            title=f"Product {i}",
+            description="Description",
+            price=Decimal("10.50"),
+            main_image="image.png",
+            images=[],
+            category_id=category.id,
+        )
+        for i in range(3)
+    ]
+    session.add_all(products)
+    await session.flush()
+    await response_cache.invalidate(Category.__tablename__)
+    await response_cache.invalidate(Product.__tablename__)
+    return products
+
+
+@pytest.fixture
+async def order(session: AsyncSession, user: User, products: list[Product]) -> Order:
+    order = Order(user_id=user.id)
+    session.add(order)
+    await session.flush()
+    session.add_all(
+        OrderProduct(
+            order_id=order.id, product_id=product.id, price=product.price, quantity=2
+        )
+        for product in products
+    )
+    await session.flush()
+    session.expunge_all()
+    return order
@@ -0,0 +1,127 @@
+import pytest
+from apps.products.cart_store import DIRTY_CARTS_KEY, cart_store
+from apps.products.models import Order, OrderProduct, Product
+from apps.users.models import User
+from services.redis_service import redis_service
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def cart(user: User, order: Order):
+    await cart_store.clear(user_id=user.id)
+    yield
+    await cart_store.clear(user_id=user.id)
+    async with redis_service.get_redis() as _redis:
+        await _redis.srem(DIRTY_CARTS_KEY, user.id)
+
+
+async def test_change_quantity_of_cleared_cart(
+    session: AsyncSession,
+    user: User,
+    products: list[Product],
+    cart,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    load = cart_store._load
+
+    async def load_then_clear(user_id: int, session: AsyncSession) -> dict:
+        # the cart is cleared by a payment between loading and changing it
+        cart = await load(user_id=user_id, session=session)
+        monkeypatch.setattr(cart_store, "_load", load)
+        await cart_store.clear(user_id=user_id)
+        return cart
+
+    monkeypatch.setattr(cart_store, "_load", load_then_clear)
+    await cart_store.change_quantity(
+        session=session,
+        user_id=user.id,
+        product=products[0],
+        quantity=1,
+        is_set_quantity_mode=False,
+    )
+
+    order = await cart_store.get_order(user_id=user.id, session=session)
+    quantities = {line.product.id: line.quantity for line in order.products}
+    assert quantities[products[0].id] == 3
+    await cart_store.flush(user_id=user.id, session=session)
+
+
+async def test_cart_without_order_field(
+    session: AsyncSession, user: User, products: list[Product], cart
+):
+    await cart_store.change_quantity(
+        session=session,
+        user_id=user.id,
+        product=products[0],
+        quantity=5,
+        is_set_quantity_mode=True,
+    )
+    # left by a change which recreated a cleared cart
+    async with redis_service.get_redis() as _redis:
+        await _redis.hdel(cart_store.get_cart_key(user.id), "order")
+
+    await cart_store.flush(user_id=user.id, session=session)
+    order = await cart_store.get_order(user_id=user.id, session=session)
+
+    quantities = {line.product.id: line.quantity for line in order.products}
+    assert quantities == {product.id: 2 for product in products} | {products[0].id: 5}
+
+
+async def test_flush_drops_lines_of_deleted_product(
+    session: AsyncSession, user: User, products: list[Product], cart
+):
+    product = Product(
+        title="Removed",
+        price=products[0].price,
+        main_image="image.png",
+        images=[],
+        category_id=products[0].category_id,
+    )
+    session.add(product)
+    await session.flush()
+    await cart_store.change_quantity(
+        session=session,
+        user_id=user.id,
+        product=product,
+        quantity=1,
+        is_set_quantity_mode=True,
+    )
+    await session.delete(product)
+    await session.flush()
+
+    await cart_store.flush(user_id=user.id, session=session)
+    order = await cart_store.get_order(user_id=user.id, session=session)
+
+    quantities = {line.product.id: line.quantity for line in order.products}
+    assert quantities == {product.id: 2 for product in products}
+
+
+async def test_flush_into_closed_order(
+    session: AsyncSession, user: User, order: Order, products: list[Product], cart
+):
+    await cart_store.change_quantity(
+        session=session,
+        user_id=user.id,
+        product=products[0],
+        quantity=5,
+        is_set_quantity_mode=True,
+    )
+    # closed by a payment between loading the cart and flushing it
+    await session.execute(
+        update(Order).where(Order.id == order.id).values(is_closed=True)
+    )
+
+    await cart_store.flush(user_id=user.id, session=session)
+
+    quantity = await session.scalar(
+        select(OrderProduct.quantity).where(
+            OrderProduct.order_id == order.id,
+            OrderProduct.product_id == products[0].id,
+        )
+    )
+    assert quantity == 2
+    async with redis_service.get_redis() as _redis:
+        assert not await _redis.exists(cart_store.get_cart_key(user.id))
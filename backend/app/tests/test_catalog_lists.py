@@ -0,0 +1,121 @@
+import base64
+from uuid import uuid4
+
+import orjson
+import pytest
+from apps.products.models import Category, Order, Product
+from httpx import AsyncClient
+from services.response_cache import response_cache
+from sqlalchemy.ext.asyncio import AsyncSession
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def categories(session: AsyncSession) -> list[Category]:
+    categories = [Category(name=f"Category {uuid4().hex[:12]}") for _ in range(3)]
+    session.add_all(categories)
+    await session.flush()
+    await response_cache.invalidate(Category.__tablename__)
+    return categories
+
+
+@pytest.mark.parametrize("count_strategy", ["exact", "estimated", "none"])
+@pytest.mark.parametrize("sort_by", ["id", "updated_at"])
+async def test_categories_list_projection(
+    client: AsyncClient, categories: list[Category], count_strategy: str, sort_by: str
+):
+    response = await client.get(
+        "/api/categories/",
+        params={"limit": 2, "count_strategy": count_strategy, "sort_by": sort_by},
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["items"]) == 2
+    assert set(body["items"][0]) == {"id", "name", "version"}
+    if count_strategy == "exact":
+        assert body["total"] >= len(categories)
+
+
+async def test_categories_list_projection_cursor(
+    client: AsyncClient, categories: list[Category]
+):
+    params = {"limit": 2, "pagination_mode": "cursor", "sort_by": "updated_at"}
+    first_page = (await client.get("/api/categories/", params=params)).json()
+    second_page = (
+        await client.get(
+            "/api/categories/",
+            params=params | {"cursor": first_page["next_cursor"]},
+        )
+    ).json()
+
+    first_ids = {item["id"] for item in first_page["items"]}
+    second_ids = {item["id"] for item in second_page["items"]}
+    assert first_page["has_more"]
+    assert second_ids and not first_ids & second_ids
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"sort_by": "updated_at", "value": "x", "is_datetime": False, "id": 1},
+        {"sort_by": "updated_at", "value": 1, "is_datetime": False, "id": 1},
+        {
+            "sort_by": "updated_at",
+            "value": "2000-01-01T00:00:00+00:00",
+            "is_datetime": True,
+            "id": 1,
+        },
+        {"sort_by": "updated_at", "is_datetime": False, "id": 1},
+    ],
+)
+async def test_categories_list_invalid_cursor(
+    client: AsyncClient, categories: list[Category], payload: dict
+):
+    cursor = base64.urlsafe_b64encode(orjson.dumps(payload)).decode()
+    response = await client.get(
+        "/api/categories/",
+        params={
+            "pagination_mode": "cursor",
+            "sort_by": "updated_at",
+            "cursor": cursor,
+        },
+    )
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("export_format", ["ndjson", "json"])
+@pytest.mark.parametrize(
+    "updated_since", ["2000-01-01T00:00:00", "2000-01-01T00:00:00Z"]
+)
+async def test_categories_export(
+    client: AsyncClient,
+    categories: list[Category],
+    export_format: str,
+    updated_since: str,
+):
+    response = await client.get(
+        "/api/categories/export",
+        params={"export_format": export_format, "updated_since": updated_since},
+    )
+
+    assert response.status_code == 200
+    if export_format == "json":
+        items = orjson.loads(response.content)
+    else:
+        items = [orjson.loads(line) for line in response.content.splitlines()]
+    exported_ids = {item["id"] for item in items}
+    assert {category.id for category in categories} <= exported_ids
+
+
+async def test_money_is_serialized_exactly(
+    client: AsyncClient, products: list[Product], order: Order
+):
+    product = (await client.get(f"/api/products/{products[0].id}")).json()
+    current_order = (await client.get("/api/orders/")).json()
+
+    assert product["price"] == "10.50"
+    assert {line["total"] for line in current_order["products"]} == {"21.00"}
+    assert current_order["cost"] == "63.00"
@@ -0,0 +1,47 @@
+import csv
+import io
+from uuid import uuid4
+
+import pytest
+from apps.products.importer import ProductImporter
+from apps.products.models import Product
+from apps.products.schemas import ImportFormatEnum
+from fastapi import HTTPException, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+
+pytestmark = pytest.mark.anyio
+
+
+def get_csv_row(title: str, category_id: int) -> str:
+    return f"{title},Description,10.50,{category_id},image.png\n"
+
+
+async def test_import_malformed_csv_rows(
+    session: AsyncSession, products: list[Product]
+):
+    category_id = products[0].category_id
+    content = (
+        "title,description,price,category_id,main_image\n"
+        + get_csv_row(f"Valid {uuid4().hex[:12]}", category_id)
+        + get_csv_row("With \0 byte", category_id)
+        + get_csv_row("x" * (csv.field_size_limit() + 1), category_id)
+        + get_csv_row(f"Valid {uuid4().hex[:12]}", category_id)
+    )
+    importer = ProductImporter(session=session, import_format=ImportFormatEnum.CSV)
+
+    result = await importer.run(UploadFile(file=io.BytesIO(content.encode())))
+
+    assert (result.processed, result.inserted, result.failed) == (4, 2, 2)
+    assert [error.row for error in result.errors] == [2, 3]
+    assert result.errors[0].detail.startswith("title: ")
+    assert result.errors[1].detail.startswith("Invalid CSV: ")
+
+
+@pytest.mark.parametrize("import_format", list(ImportFormatEnum))
+async def test_import_not_utf8(session: AsyncSession, import_format: ImportFormatEnum):
+    importer = ProductImporter(session=session, import_format=import_format)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await importer.run(UploadFile(file=io.BytesIO("title\nÉté\n".encode("cp1252"))))
+
+    assert exc_info.value.status_code == 400
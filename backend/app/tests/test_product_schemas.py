@@ -0,0 +1,17 @@
+import pytest
+from apps.products.schemas import BatchPatchProductItemSchema, PatchProductSchema
+from pydantic import ValidationError
+
+
+@pytest.mark.parametrize("field", ["title", "price", "category_id", "images"])
+def test_patch_product_rejects_null(field: str):
+    with pytest.raises(ValidationError) as exc_info:
+        BatchPatchProductItemSchema.model_validate({"id": 1, "changes": {field: None}})
+
+    assert exc_info.value.errors()[0]["loc"] == ("changes", field)
+
+
+def test_patch_product_leaves_out_unset():
+    changes = PatchProductSchema.model_validate({"title": "New title"})
+
+    assert changes.model_dump(exclude_unset=True) == {"title": "New title"}
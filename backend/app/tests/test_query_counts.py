@@ -0,0 +1,70 @@
+import pytest
+from apps.core.query_counter import count_queries
+from apps.products.models import Order, Product
+from apps.users.models import User
+from httpx import AsyncClient
+
+pytestmark = pytest.mark.anyio
+
+
+def without_savepoints(statements: list[str]) -> list[str]:
+    # the test transaction wraps every commit of the app into a savepoint
+    return [
+        statement
+        for statement in statements
+        if not statement.startswith(("SAVEPOINT", "RELEASE SAVEPOINT"))
+    ]
+
+
+@pytest.mark.parametrize("url", ["/api/products/", "/api/categories/"])
+async def test_catalog_list_is_one_query(
+    client: AsyncClient, products: list[Product], url: str
+):
+    with count_queries() as statements:
+        response = await client.get(url, params={"count_strategy": "exact"})
+    assert response.status_code == 200
+    # the page and its total count come from one statement
+    assert len(without_savepoints(statements)) == 1
+
+    with count_queries() as statements:
+        response = await client.get(url, params={"count_strategy": "exact"})
+    assert response.status_code == 200
+    assert statements == []
+
+
+async def test_current_order_queries(client: AsyncClient, order: Order):
+    with count_queries() as statements:
+        response = await client.get("/api/orders/")
+
+    assert response.status_code == 200
+    assert len(response.json()["products"]) == 3
+    # the order with its user, then its lines with their products
+    assert len(without_savepoints(statements)) == 2
+
+
+async def test_new_order_queries(client: AsyncClient, user: User):
+    with count_queries() as statements:
+        response = await client.get("/api/orders/")
+
+    assert response.status_code == 200
+    assert response.json()["products"] == []
+    # lookup, insert, then the new order with its relationships
+    assert len(without_savepoints(statements)) == 4
+
+
+async def test_change_order_product_quantity_queries(
+    client: AsyncClient, order: Order, products: list[Product]
+):
+    with count_queries() as statements:
+        response = await client.patch(
+            "/api/orders/change-order-product-quantity",
+            json={"product_id": products[0].id, "quantity": 1, "mode": "increase"},
+        )
+
+    assert response.status_code == 200
+    quantities = {
+        line["product"]["id"]: line["quantity"] for line in response.json()["products"]
+    }
+    assert quantities[products[0].id] == 3
+    # the order, the line upsert, then the order with its lines
+    assert len(without_savepoints(statements)) == 4
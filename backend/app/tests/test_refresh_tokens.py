@@ -0,0 +1,41 @@
+from uuid import uuid4
+
+import pytest
+from apps.auth.auth_handler import auth_handler
+from apps.users.models import User
+from httpx import AsyncClient
+from services.redis_service import redis_service
+
+pytestmark = pytest.mark.anyio
+
+
+async def get_refresh_token(user_id: int, refresh_key: str) -> str:
+    return await auth_handler.generate_token(
+        payload={"sub": str(user_id), "key": refresh_key},
+        expire_minutes=auth_handler.refresh_token_expires,
+    )
+
+
+async def test_refresh(client: AsyncClient, user: User):
+    login_response = await auth_handler.generate_tokens(user=user)
+
+    response = await client.post(
+        "/api/auth/refresh",
+        headers={"X-Refresh-Token": login_response.refresh_token},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["refresh_token"] != login_response.refresh_token
+
+
+async def test_refresh_legacy_record(client: AsyncClient, user: User):
+    # written before the record held the user: only its id
+    refresh_key = uuid4().hex
+    await redis_service.set_cache(key=refresh_key, value=user.id, ttl=1)
+
+    response = await client.post(
+        "/api/auth/refresh",
+        headers={"X-Refresh-Token": await get_refresh_token(user.id, refresh_key)},
+    )
+
+    assert response.status_code == 401
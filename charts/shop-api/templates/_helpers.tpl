@@ -48,6 +48,14 @@ app.kubernetes.io/name: {{ include "shop-api.name" . }}
 app.kubernetes.io/instance: {{ .Release.Name }}
 {{- end }}
 
+{{/*
+Payment worker selector labels - a separate name, so the api Deployment and Service do not select worker pods.
+*/}}
+{{- define "shop-api.paymentWorkerSelectorLabels" -}}
+app.kubernetes.io/name: {{ include "shop-api.name" . }}-payment-worker
+app.kubernetes.io/instance: {{ .Release.Name }}
+{{- end }}
+
 {{/*
 Create the name of the service account to use
 */}}